@@ -3,153 +3,186 @@ import numpy as np
 class Ant:
     """
     Class realizing single ant functionality
+    The state of the ant lives in the arrays of its Colony, an Ant is a view
+    on one entry of them and moves it one ant at a time
     
     Attributes:
         *** operational attributes ***
+        - colony: Colony holding the state of all ants
         - number: oridnal number of an ant
         - node_memory: current edge in form of list of two nodes
+        - edge: index of the current half-edge in the EdgeStore, -1 before the first move
         - src_node:  start and first target node of an ant
         - dst_node: second target node of an ant
         
         *** statistical attributes ***
         - cost_sum: statistical measure: 
-        - passes: counter of times an ant reached one of its destination node
+        - passes: costs of the last trips of an ant, one per reached destination
     
     Methods:
-        - findNext(graph_data, parameters) -> next_node: 
-            determines next node for the ant to move to
-        - depositPheromones(graph_data, parameters) -> graph_data: 
-            updates pheromones on the current edge and returns updated graph_data
-        - move(graph_data, parameters) -> graph_data:
-            moves an Ant to the next edge determined by findNext() and updated appriopriately 
-            data in graph_data, finally returns updated graph_data
+        - findNext(edges, parameters) -> next_edge: 
+            determines next half-edge for the ant to move along
+        - depositPheromones(edges, parameters): 
+            updates pheromones on the current edge
+        - move(edges, parameters):
+            moves an Ant to the next edge determined by findNext() and updates appriopriately 
+            the data in edges
         - showState(): 
             prints the curruent state of an ant (all of its attributes values)
-        - showFindNext(graph_data, probs, next_node): 
+        - showFindNext(edges, probs, next_edge): 
             prints all data relevant in context of findNext() for debugging purposes
         
     """
-    def __init__(self, src_node, dst_node, number):
+    def __init__(self, colony, number):
         
+        self.colony = colony
         self.number= number
-        self.node_memory = [src_node,src_node]
-        self.src_node = src_node
-        self.dst_node = dst_node
         
-        self.passes = []
-        self.cost_sum = 0.0
+    @property
+    def node_memory(self):
+        return [int(self.colony.prev_node[self.number]), int(self.colony.cur_node[self.number])]
+
+    @property
+    def edge(self):
+        return int(self.colony.edge[self.number])
+
+    @property
+    def src_node(self):
+        return int(self.colony.src_node[self.number])
+
+    @property
+    def dst_node(self):
+        return int(self.colony.dst_node[self.number])
+
+    @property
+    def cost_sum(self):
+        return self.colony.cost_sum[self.number].item()
+
+    @property
+    def passes(self):
+        return self.colony.passes[self.number]
            
-    def findNext(self, graph_data, parameters):
+    def findNext(self, edges, parameters):
         """
         Determines the next node for the ant to move to based 
-        on the pheromones on an edge: the more pheromones the better an edge
+        on the pheromones on an edge: the more pheromones the better an edge,
+        weighted by the heuristic of the colony if it has one (see heuristic.py)
         
         Arguments: 
-            graph_data: all data about nodes & edges as a dict
+            edges: EdgeStore with all data about nodes & edges
             parameters: dict of all steering parameters
             
         Return:
-            next_node: id of the node that has been chosen as the next to go
+            next_edge: index of the half-edge leading to the node chosen as the next to go
         """
-        
-        # extract pheromone values for all candidates for next_node
-        pheromones = list(graph_data[self.node_memory[-1]]['pheromones'].values())
-        
-        # find the index of the last visited node respective to the order of the pheromones list
-        if self.node_memory[0] != self.node_memory[-1] and self.node_memory[-1]!= self.dst_node :
-            prev_node = list(graph_data[self.node_memory[-1]]['pheromones'].keys()).index(self.node_memory[0])
-        else:    
-            prev_node = -1
-            
-        # calculate probability for each candidate
-        probs = []
-        for i in range(len(pheromones)):
-            if len(pheromones)==1: # if there is only one possible candidate, take it
-                probs.append(1)
-            elif prev_node==i: # if the candidate was visited in last move, do not take it
-                probs.append(0)
-            else:
-                probs.append(pow(pheromones[i],parameters['alpha'])) 
-                
-        # convert probabilites list to an array and normalize probabilities such that their sum equals 1
-        probs = np.asarray( probs )
-        probs = probs/sum(probs)
-        
-        # determine next node for the ant to move to
-        next_node = np.random.choice(list(graph_data[self.node_memory[-1]]['pheromones'].keys()), p=probs)
-        #self.showFindNext(graph_data, probs, next_node)
-        return next_node
+        prev_node = self.colony.prev_node[self.number]
+        cur_node = self.colony.cur_node[self.number]
+        
+        # candidates for next_node are the neighbors of the current node
+        lo, hi = edges.offsets[cur_node], edges.offsets[cur_node+1]
+        
+        # if there is only one possible candidate, take it unless it is closed
+        if hi - lo == 1 and not edges.closed[lo]:
+            return lo
+        
+        # cumulative weights pheromone^alpha of all candidates, with the heuristic
+        # factor towards the destination of the ant if there is one
+        heuristic = self.colony.heuristic
+        if heuristic is None:
+            cumulative = edges.cumulativeWeights(cur_node, parameters['alpha'])
+        else:
+            candidates = np.arange(lo, hi)
+            weights = np.where(edges.closed[candidates], 0.0,
+                               edges.raw_pheromones[edges.edge_ids[candidates]] ** parameters['alpha'])
+            cumulative = np.cumsum(weights * heuristic.factors(edges, candidates, self.colony.dst_node[self.number], parameters))
+        sample = self.colony.random.uniform()
+        
+        # if the candidate was visited in last move, do not take it:
+        # sample from the other candidates and skip the weight of the visited one
+        edge = self.colony.edge[self.number]
+        if prev_node != cur_node and cur_node != self.colony.dst_node[self.number] :
+            prev_index = edges.reverse[edge] - lo
+            prev_weight = cumulative[prev_index] - (cumulative[prev_index-1] if prev_index > 0 else 0)
+            total = cumulative[-1] - prev_weight
+            sample *= total
+            if sample >= cumulative[prev_index] - prev_weight:
+                sample += prev_weight
+        else:
+            total = cumulative[-1]
+            sample *= total
+        
+        # without any weight left, e.g. with all other candidates closed, see EdgeStore.fallbackChoice()
+        if total == 0:
+            back = edges.reverse[edge] if edge >= 0 else -1
+            return lo + int(edges.fallbackChoice(np.arange(lo, hi)[None, :], np.ones((1, hi - lo), dtype=bool), [back])[0])
+        
+        # determine next node for the ant to move to by inverting the cumulative weights
+        next_edge = lo + min(np.searchsorted(cumulative, sample, side='right'), hi - lo - 1)
+        #self.showFindNext(edges, np.diff(cumulative, prepend=0)/cumulative[-1], next_edge)
+        return next_edge
     
-    def depositPheromones(self, graph_data, parameters ):
+    def depositPheromones(self, edges, parameters ):
         """
         Deposits pheromones on current edge
         increase factor is equal ((max_vol - cur_vol)/max_vol))*enhancement_rate 
         and is inversely proportional in current volume of an edge
         
         Arguments:
-            graph_data: all data about nodes & edges as a dict
+            edges: EdgeStore with all data about nodes & edges
             parameters: dict of all steering parameters  
-            
-        Return:
-            graph_data: with updated pheromone levels
         """
         # extract current and maximum capacity for current edge
-        cur_vol = graph_data[self.node_memory[0]]['cur_vol'][self.node_memory[-1]]
-        max_vol = graph_data[self.node_memory[0]]['max_vol'][self.node_memory[-1]]
-        neighbors = len(graph_data[self.node_memory[-1]]['cur_vol'])
+        edge = self.colony.edge[self.number]
+        edge_id = edges.edge_ids[edge]
+        cur_vol = edges.cur_vol[edge_id]
+        max_vol = edges.max_vol[edge]
+        neighbors = edges.degree(self.colony.cur_node[self.number])
         
         # add costs for current edge to the overall sum  for statistics
-        self.cost_sum += graph_data[self.node_memory[0]]['costs'][self.node_memory[-1]]
+        self.colony.cost_sum[self.number] += edges.costs[edge]
         
         # deposite pheromones only if there is capacity available on current edge and it is not a dead end
+        # both directions share the same pheromone entry, so a single update covers them
         if cur_vol <= max_vol and neighbors > 1:
-            pheromone = graph_data[self.node_memory[0]]['pheromones'][self.node_memory[-1]]
-            cost = graph_data[self.node_memory[0]]['costs'][self.node_memory[-1]] +1
+            pheromone = edges.raw_pheromones[edge_id]
+            cost = edges.costs[edge] +1
             growth = (pheromone/cost)*((max_vol-cur_vol)/(max_vol+1))*parameters["enhancement_rate"]
-            graph_data[self.node_memory[0]]['pheromones'][self.node_memory[-1]] += growth
-            graph_data[self.node_memory[-1]]['pheromones'][self.node_memory[0]] += growth
-        
-        return graph_data
+            edges.raw_pheromones[edge_id] += growth
+            edges.invalidateWeights(self.colony.prev_node[self.number], self.colony.cur_node[self.number])
     
-    def move(self, graph_data, parameters):
+    def move(self, edges, parameters):
         """
         Executes the move of an ant based on the heuristics function
+        and updates pheromone and current capacity (!) values in edges
         
         Arguments:
-            graph_data: all data about nodes & edges as a dict
-            enhancement_rate: by how much should be the pheromone increase 
-            after visiting an edge
-            
-        Return: 
-            graph_data: with updated pheromon and current capacity (!) values             
+            edges: EdgeStore with all data about nodes & edges
+            parameters: dict of all steering parameters
         """
-        nextNode = self.findNext(graph_data, parameters)
+        colony, k = self.colony, self.number
+        next_edge = self.findNext(edges, parameters)
         
         # decrement current capacity on current edge only if
         # it is not initial state and capaciy is greater than zero
-        if self.node_memory[-1]!=self.node_memory[0] and graph_data[self.node_memory[0]]['cur_vol'][self.node_memory[-1]] > 0:
-                graph_data[self.node_memory[0]]['cur_vol'][self.node_memory[-1]] -= 1
-                graph_data[self.node_memory[-1]]['cur_vol'][self.node_memory[0]] -= 1
+        if colony.edge[k] >= 0 and edges.cur_vol[edges.edge_ids[colony.edge[k]]] > 0:
+                edges.cur_vol[edges.edge_ids[colony.edge[k]]] -= 1
         
-        self.node_memory.append(nextNode)
-        self.node_memory.pop(0)
+        colony.prev_node[k] = colony.cur_node[k]
+        colony.cur_node[k] = edges.neighbors[next_edge]
+        colony.edge[k] = next_edge
 
         # update pheromones on the current edge
-        graph_data = self.depositPheromones(graph_data, parameters)
+        self.depositPheromones(edges, parameters)
         
         # increment current volume on the new current edge
-        graph_data[self.node_memory[0]]['cur_vol'][self.node_memory[-1]] += 1
-        graph_data[self.node_memory[-1]]['cur_vol'][self.node_memory[0]] += 1
-        
-        if (self.node_memory[-1] == self.dst_node ):
-            self.src_node, self.dst_node = self.dst_node, self.src_node
-            self.passes.append(self.cost_sum)
-            self.cost_sum = 0.0
-
-        if(parameters['verbose']):
-            print("Ant ", self.number, " - took (",self.node_memory[-1],",",self.node_memory[0],")")
-           
-        return graph_data
+        edges.cur_vol[edges.edge_ids[next_edge]] += 1
+        
+        if (colony.cur_node[k] == colony.dst_node[k] ):
+            colony.src_node[k], colony.dst_node[k] = colony.dst_node[k], colony.src_node[k]
+            colony.passes[k].append(colony.cost_sum[k].item())
+            colony.statistics.update(np.array([k]), colony.cost_sum[k:k+1])
+            colony.last_pass[k] = colony.cost_sum[k]
+            colony.cost_sum[k] = 0.0
     
     def showState(self):
         """
@@ -158,7 +191,7 @@ class Ant:
         print("[ant]: current state of the ant...............................")
         print("    ant nr: ",self.number," node_memory: ", self.node_memory," src: ",self.src_node," dst: ",self.dst_node)
         
-    def showFindNext(self, graph_data, probs, next_node):
+    def showFindNext(self, edges, probs, next_edge):
         """
         Prints all data relevant in context of findNext():
             - current edge 
@@ -169,17 +202,14 @@ class Ant:
             - decision that was undertaken
         
         Arguments:
-            graph_data:
+            edges: EdgeStore with all data about nodes & edges
             probs: array of probabilites for all candidates
-            next_node: the candidate chosen by findNext()
+            next_edge: the half-edge chosen by findNext()
             
         """
-        probs = list(probs)
-        pheromones = list(graph_data[self.node_memory[-1]]['pheromones'].values())
-        costs = list(graph_data[self.node_memory[-1]]['costs'].values())
-        cur_vol = list(graph_data[self.node_memory[-1]]['cur_vol'].values())
-        max_vol = list(graph_data[self.node_memory[-1]]['max_vol'].values())
-        print("[ant]: I ( ant nr",self.number,")am at edge (",self.node_memory[0],",",self.node_memory[-1],") and I can choose between: ")
-        for i in list(graph_data[self.node_memory[-1]]['pheromones'].keys()):
-            print("    edge (",self.node_memory[-1],",",i,") phe: ", pheromones.pop(0)," cost: ",costs.pop(0),"cur_vol: ",cur_vol.pop(0)," max_vol: ",max_vol.pop(0)," prob: ",probs.pop(0))
-        print("    I decided to take edge (",self.node_memory[-1],",",next_node,")")
\ No newline at end of file
+        prev_node, cur_node = self.node_memory
+        lo, hi = edges.offsets[cur_node], edges.offsets[cur_node+1]
+        print("[ant]: I ( ant nr",self.number,")am at edge (",prev_node,",",cur_node,") and I can choose between: ")
+        for i in range(lo, hi):
+            print("    edge (",cur_node,",",edges.neighbors[i],") phe: ", edges.pheromones[edges.edge_ids[i]]," cost: ",edges.costs[i],"cur_vol: ",edges.cur_vol[edges.edge_ids[i]]," max_vol: ",edges.max_vol[i]," prob: ",probs[i-lo])
+        print("    I decided to take edge (",cur_node,",",edges.neighbors[next_edge],")")
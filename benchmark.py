@@ -0,0 +1,143 @@
+from graph import Graph
+from profiler import Profiler
+from config import loadConfig
+from itertools import product
+from time import perf_counter
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tracemalloc
+import numpy as np
+
+"""
+Benchmark of the simulation engine: runs the ladder graph (custom_graph == False)
+for every combination of the given node numbers, ant numbers and steps, as well
+as the 9 node example network of configs/experimentc.toml, and reports moves per second, the time
+spent in each phase of a step and the peak memory as JSON. Moves per second
+are measured without any instrumentation, the phases in a second run under
+a Profiler and the peak memory in a third one under tracemalloc. Progress is
+printed to stderr, so the report on stdout can be piped on as it is.
+
+    python benchmark.py --nodes 10 100 1000 --ants 10 100 --steps 50 --output bench.json
+"""
+
+# config of experimentc.py, the example network is taken from it
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs", "experimentc.toml")
+
+def getParameters(node_number, ant_number, steps, example=False):
+    """
+    Returns parameters of a benchmark run on the ladder graph or on the example network
+    """
+    parameters = {
+        'file_name': "",
+        'verbose': False,
+        'custom_graph': example,
+        'custom_weights': example,
+        'ant_number': ant_number,
+        'node_number': 9 if example else node_number,
+        'steps': steps,
+        'src_nodes': [0],
+        'dst_nodes': [8] if example else [node_number // 2],
+        'init_pheromon': 1,
+        'alpha': 1,
+        'beta': 1,
+        'gamma': 1,
+        'enhancement_rate': 0.2,
+        'evaporation_rate': 0.01,
+        'edges_to_reset': [],
+        'step_to_reset': -1,
+    }
+    if example:
+        parameters['edges'] = loadConfig(EXAMPLE_CONFIG)[0]['edges']
+    return parameters
+
+def benchmarkCase(parameters, memory=True):
+    """
+    Simulates one setup and measures it
+
+    Arguments:
+        parameters: setup of the run
+        memory: whether to repeat the run under tracemalloc to measure peak memory
+        
+        The throughput is timed in a plain run, the wrappers of the Profiler would
+        slow it down, so the phases are timed in a repeated run
+
+    Return:
+        dict with the setup and its measurements
+    """
+    result = {key: parameters[key] for key in ('custom_graph', 'node_number', 'ant_number', 'steps')}
+    result['batched'] = parameters.get('batched', False)
+    result['aggregate'] = parameters.get('aggregate', False)
+    result['evaporation_mode'] = parameters.get('evaporation_mode', 'move')
+
+    start = perf_counter()
+    graph = Graph(dict(parameters))
+    result['setup_time'] = perf_counter() - start
+    result['node_number'] = len(graph.edges.offsets) - 1
+    result['edge_number'] = len(graph.edges.raw_pheromones)
+
+    start = perf_counter()
+    graph.performSimulation()
+    result['simulation_time'] = perf_counter() - start
+    result['moves_per_second'] = parameters['ant_number'] * parameters['steps'] / result['simulation_time']
+
+    with Profiler() as profiler:
+        graph = Graph(dict(parameters))
+        graph.performSimulation()
+        graph.toNetworkx()
+    result['phase_times'] = profiler.summary()['times']
+
+    if memory:
+        tracemalloc.start()
+        graph = Graph(dict(parameters))
+        graph.performSimulation()
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def performBenchmark(node_numbers, ant_numbers, steps, modes=('ant', 'batched', 'aggregate'), evaporation_mode='move', seed=0, memory=True):
+    """
+    Runs benchmarkCase() for the example network and every combination of
+    node numbers, ant numbers, steps and modes on the ladder graph
+
+    Return:
+        dict with information about the environment and a list of results
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    report = {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__, 'results': []}
+
+    setups = [getParameters(9, ant_number, step, example=True) for ant_number, step in product(ant_numbers, steps)]
+    setups += [getParameters(*setup) for setup in product(node_numbers, ant_numbers, steps)]
+    for parameters, mode in product(setups, modes):
+        parameters.update({'batched': mode == 'batched', 'aggregate': mode == 'aggregate', 'evaporation_mode': evaporation_mode, 'seed': seed})
+        result = benchmarkCase(parameters, memory)
+        print("nodes:", result['node_number'], " ants:", result['ant_number'], " steps:", result['steps'],
+              " mode:", mode, " moves/s:", round(result['moves_per_second']), file=sys.stderr)
+        report['results'].append(result)
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of the ACO simulation engine")
+    parser.add_argument('--nodes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--ants', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--steps', type=int, nargs='+', default=[50])
+    parser.add_argument('--modes', nargs='+', choices=['ant', 'batched', 'aggregate'], default=['ant', 'batched', 'aggregate'])
+    parser.add_argument('--evaporation-mode', choices=['move', 'step'], default='move')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak memory measurement")
+    parser.add_argument('--output', default="", help="file to write the JSON report to, stdout if empty")
+    args = parser.parse_args()
+
+    report = performBenchmark(args.nodes, args.ants, args.steps, args.modes, args.evaporation_mode,
+                              args.seed, not args.no_memory)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,171 @@
+import argparse
+import json
+import math
+import os
+import sys
+from contextlib import redirect_stdout
+from config import loadConfig, parseOverride
+
+"""
+Command line entry point running simulations and sweeps from config files,
+see config.py:
+
+    python cli.py run configs/experimentc.toml --set steps=200 --output result.json
+    python cli.py run configs/experimentc.toml --islands 4 --exchange best
+    python cli.py sweep configs/optimal_parameter.toml --processes 8 --image sweep.png
+    python cli.py sweep configs/optimal_parameter.toml --adaptive
+
+The simulation modules, and matplotlib only when an image is requested, are
+imported by the commands themselves, so starting the program stays fast.
+Everything the simulation prints, e.g. the state printed with verbose set,
+goes to stderr, so that stdout carries the JSON result only. Values which
+are not finite, e.g. the nan solution of a run without completed trips, are
+written as null, so the result is always valid JSON.
+"""
+
+def readParameters(args):
+    """
+    Returns the parameters and the sweep table of the config with the overrides applied
+    """
+    parameters, sweep = loadConfig(args.config)
+    for override in args.set:
+        key, value = parseOverride(override)
+        parameters[key] = value
+    return parameters, sweep
+
+def toJson(value):
+    """
+    Returns value with nan and infinite floats in all its dicts, lists and tuples replaced by None
+    """
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: toJson(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [toJson(item) for item in value]
+    return value
+
+def writeResult(result, path, stdout=None):
+    text = json.dumps(toJson(result), indent=2, allow_nan=False)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text)
+        return
+    stdout = stdout or sys.stdout
+    try:
+        print(text, file=stdout)
+        stdout.flush()
+    except BrokenPipeError:
+        # the reader stopped early, e.g. head; the interpreter would fail
+        # again flushing stdout at exit, so the rest goes to devnull
+        os.dup2(os.open(os.devnull, os.O_WRONLY), stdout.fileno())
+        sys.exit(1)
+
+def performRun(args):
+    """
+    Simulates the config, on several islands with --islands, or continues the
+    checkpoint given by --resume, and reports the solution, the steps performed,
+    the edges with most pheromones, with replicas the distribution of the
+    solutions of the replicas and with islands the solution of each island
+    """
+    from graph import Graph
+    solutions = None
+    if args.resume:
+        graph = Graph.fromCheckpoint(args.resume)
+        graph.performSimulation()
+    elif args.islands > 1:
+        from islands import performIslands
+        graph, solutions = performIslands(readParameters(args)[0], args.islands, args.exchange_interval,
+                                          args.exchange, args.exchange_rate)
+    else:
+        graph = Graph(readParameters(args)[0])
+        graph.performSimulation()
+    if args.image:
+        from render import graphFrame, renderGraph
+        renderGraph(graphFrame(graph), args.image)
+    result = {'solution': graph.getSolution(),
+              'steps': graph.step,
+              'converged_step': graph.converged_step,
+              'top_edges': graph.topEdges(args.top)}
+    if graph.edges.replicas > 1:
+        result['replicas'] = graph.getSolutionStats()
+    if solutions is not None:
+        result['islands'] = solutions.tolist()
+    writeResult(result, args.output, args.stdout)
+
+def performConfigSweep(args):
+    """
+    Sweeps the grid of the sweep table of the config, command line options
+    taking precedence, and reports all solutions and the best cell. With
+    --adaptive the grid is searched by successive halving instead, with
+    min_steps, eta and refine from the sweep table
+    """
+    from sweep import performSweep, performSuccessiveHalving
+    import numpy as np
+    parameters, sweep = readParameters(args)
+    grid = sweep.get('grid')
+    if not grid:
+        raise SystemExit("the config has no [sweep.grid] table")
+    replicas = args.replicas or sweep.get('replicas', 1)
+    processes = args.processes if args.processes is not None else sweep.get('processes')
+    seed = args.seed if args.seed is not None else sweep.get('seed')
+
+    if args.adaptive:
+        best, rungs = performSuccessiveHalving(parameters, grid, sweep.get('min_steps', 10), sweep.get('eta', 3),
+                                               replicas, processes, seed, sweep.get('refine', 0))
+        writeResult({'grid': grid,
+                     'rungs': [{'steps': rung['steps'], 'candidates': rung['candidates'],
+                                'solutions': rung['solutions'].tolist()}
+                               for rung in rungs],
+                     'best': best}, args.output, args.stdout)
+        return
+
+    solutions, best = performSweep(parameters, grid, replicas, processes, seed)
+    if args.image and len(grid) == 2:
+        from render import renderHeatmap
+        x, y = grid
+        renderHeatmap(np.nanmean(solutions, axis=-1), args.image, grid[x], grid[y], x, y, 'solution')
+    writeResult({'grid': grid,
+                 'solutions': solutions.tolist(),
+                 'best': {name: grid[name][i] for name, i in zip(grid, best)}}, args.output, args.stdout)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ACO simulation of urban transport")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="simulate one config")
+    run.add_argument('config', nargs='?', help="JSON or TOML config file")
+    run.add_argument('--resume', default="", help="checkpoint directory to continue instead of the config")
+    run.add_argument('--top', type=int, default=10, help="number of edges with most pheromones to report")
+    run.add_argument('--islands', type=int, default=1, help="colonies in separate processes sharing the ants")
+    run.add_argument('--exchange-interval', type=int, default=10, help="steps between exchanges of pheromones of the islands")
+    run.add_argument('--exchange', choices=('average', 'best'), default='average',
+                     help="merge the pheromones of the islands by their mean or take those of the best island")
+    run.add_argument('--exchange-rate', type=float, default=1.0,
+                     help="part of the way from its own pheromones to the merged ones an island goes")
+    run.set_defaults(function=performRun)
+
+    sweep = commands.add_parser('sweep', help="simulate the grid of a config on worker processes")
+    sweep.add_argument('config', help="JSON or TOML config file with a [sweep.grid] table")
+    sweep.add_argument('--replicas', type=int, default=0, help="simulations per cell, from the config if 0")
+    sweep.add_argument('--processes', type=int, default=None, help="worker processes, all cores if not set")
+    sweep.add_argument('--seed', type=int, default=None)
+    sweep.add_argument('--adaptive', action='store_true', help="search the grid by successive halving")
+    sweep.set_defaults(function=performConfigSweep)
+
+    for command in (run, sweep):
+        command.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                             help="override a parameter, the value is read as JSON if possible")
+        command.add_argument('--output', default="", help="file to write the JSON result to, stdout if empty")
+        command.add_argument('--image', default="", help="PNG file to render the graph or the sweep to")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run' and not args.config and not args.resume:
+        parser.error("run needs a config or --resume")
+    # the result is written to the original stdout, see writeResult()
+    args.stdout = sys.stdout
+    with redirect_stdout(sys.stderr):
+        args.function(args)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
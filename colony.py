@@ -0,0 +1,277 @@
+import numpy as np
+import os
+from collections import deque
+from streamstats import TripStatistics
+
+class Colony:
+    """
+    Class keeping the state of all ants in struct-of-arrays form and
+    moving the whole colony in one vectorized pass per step
+
+    Attributes:
+        *** operational attributes ***
+        - prev_node: node each ant came from, equal to cur_node before the first move
+        - cur_node: node each ant is currently at
+        - edge: index of the current half-edge of each ant, -1 before the first move
+        - src_node: start and first target node of each ant
+        - dst_node: second target node of each ant
+
+        - random: RandomStream all routing decisions are drawn from
+        - heuristic: DistanceHeuristic weighting the routing decisions, None to route by pheromones only
+
+        *** statistical attributes ***
+        - cost_sum: cost of the current trip of each ant
+        - passes: costs of the last trips of each ant, one entry per reached
+            destination, at most history of them
+        - last_pass: cost of the last completed trip of each ant, nan if there is none yet
+        - statistics: TripStatistics of all trips of each ant and of the colony
+        - history: number of trip costs kept in passes, all if None
+
+    Methods:
+        - reset(src_nodes, dst_nodes): puts all ants back to their start nodes
+        - addAnts(src_nodes, dst_nodes): spawns ants at the given start nodes
+        - removeAnts(numbers): removes the ants with the given numbers,
+            the remaining ants are renumbered in their order
+        - save(directory): writes the state of all ants as .npy files
+        - load(directory, random, history) -> Colony: reads a colony written by save()
+        - solution() -> mean over the ants of their median trip cost
+        - findNext(edges, parameters) -> next_edges:
+            determines next half-edge for every ant at once
+        - depositPheromones(edges, parameters, ahead):
+            updates pheromones on the current edges of all ants
+        - move(edges, parameters):
+            moves all ants along the edges determined by findNext() and updates
+            appriopriately volumes and pheromones in edges
+
+    """
+    def __init__(self, src_nodes, dst_nodes, random, history=None):
+
+        self.random = random
+        self.history = history
+        self.heuristic = None
+        self.src_node = np.asarray(src_nodes, dtype=np.int64)
+        self.dst_node = np.asarray(dst_nodes, dtype=np.int64)
+        self.prev_node = self.src_node.copy()
+        self.cur_node = self.src_node.copy()
+        self.edge = np.full(len(self.src_node), -1, dtype=np.int64)
+
+        self.cost_sum = np.zeros(len(self.src_node), dtype=np.float64)
+        self.passes = [deque(maxlen=history) for _ in range(len(self.src_node))]
+        self.last_pass = np.full(len(self.src_node), np.nan)
+        self.statistics = TripStatistics(len(self.src_node))
+
+    def reset(self, src_nodes, dst_nodes):
+        """
+        Puts all ants back to their start nodes and clears their statistics,
+        reusing the arrays if the number of ants did not change
+        """
+        if len(src_nodes) != len(self):
+            heuristic = self.heuristic
+            self.__init__(src_nodes, dst_nodes, self.random, self.history)
+            self.heuristic = heuristic
+            return
+        self.src_node[:] = src_nodes
+        self.dst_node[:] = dst_nodes
+        self.prev_node[:] = self.src_node
+        self.cur_node[:] = self.src_node
+        self.edge.fill(-1)
+
+        self.cost_sum.fill(0.0)
+        self.last_pass.fill(np.nan)
+        for passes in self.passes:
+            passes.clear()
+        self.statistics = TripStatistics(len(self))
+
+    def addAnts(self, src_nodes, dst_nodes):
+        src_nodes = np.asarray(src_nodes, dtype=np.int64)
+        self.src_node = np.concatenate([self.src_node, src_nodes])
+        self.dst_node = np.concatenate([self.dst_node, np.asarray(dst_nodes, dtype=np.int64)])
+        self.prev_node = np.concatenate([self.prev_node, src_nodes])
+        self.cur_node = np.concatenate([self.cur_node, src_nodes])
+        self.edge = np.concatenate([self.edge, np.full(len(src_nodes), -1, dtype=np.int64)])
+
+        self.cost_sum = np.concatenate([self.cost_sum, np.zeros(len(src_nodes))])
+        self.passes += [deque(maxlen=self.history) for _ in range(len(src_nodes))]
+        self.last_pass = np.concatenate([self.last_pass, np.full(len(src_nodes), np.nan)])
+        self.statistics.add(len(src_nodes))
+
+    def removeAnts(self, numbers):
+        keep = np.ones(len(self), dtype=bool)
+        keep[numbers] = False
+        for name in self.arrays:
+            setattr(self, name, getattr(self, name)[keep])
+        self.passes = [passes for passes, kept in zip(self.passes, keep) if kept]
+        self.statistics.select(keep)
+
+    arrays = ('src_node', 'dst_node', 'prev_node', 'cur_node', 'edge', 'cost_sum', 'last_pass')
+
+    def save(self, directory):
+        """
+        Writes the state of all ants as .npy files to directory, the lists of
+        passes are stored concatenated together with the offset of each ant,
+        the statistics in the subdirectory statistics
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self.arrays:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+        lengths = [len(passes) for passes in self.passes]
+        np.save(os.path.join(directory, "passes.npy"), np.fromiter((cost for passes in self.passes for cost in passes),
+                                                                  dtype=np.float64, count=sum(lengths)))
+        np.save(os.path.join(directory, "passes_offsets.npy"), np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64))
+        self.statistics.save(os.path.join(directory, "statistics"))
+
+    @classmethod
+    def load(cls, directory, random, history=None):
+        """
+        Reads a colony written by save()
+
+        Arguments:
+            directory: directory the colony was saved to
+            random: RandomStream the colony draws its routing decisions from
+            history: number of trip costs kept in passes, all if None
+
+        Return:
+            Colony in the saved state
+        """
+        colony = cls.__new__(cls)
+        colony.random = random
+        colony.history = history
+        colony.heuristic = None
+        for name in cls.arrays:
+            setattr(colony, name, np.load(os.path.join(directory, name + ".npy")))
+        passes = np.load(os.path.join(directory, "passes.npy")).tolist()
+        offsets = np.load(os.path.join(directory, "passes_offsets.npy"))
+        colony.passes = [deque(passes[offsets[k]:offsets[k+1]], maxlen=history) for k in range(len(offsets)-1)]
+        colony.statistics = TripStatistics.load(os.path.join(directory, "statistics"))
+        return colony
+
+    def __len__(self):
+        return len(self.src_node)
+
+    def solution(self):
+        return self.statistics.solution()
+
+    def findNext(self, edges, parameters):
+        """
+        Samples the next half-edge of every ant with the same rule as Ant.findNext():
+        probability proportional to pheromone^alpha, times the heuristic factor
+        if there is a heuristic, without going back the
+        edge an ant just came from unless it is a dead end or at its destination
+
+        Arguments:
+            edges: EdgeStore with all data about nodes & edges
+            parameters: dict of all steering parameters
+
+        Return:
+            next_edges: array with the index of the chosen half-edge for each ant
+        """
+        # a colony whose ants were all removed by events does not move
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        # weight of every half-edge, computed once for all ants
+        weights = edges.raw_pheromones[edges.edge_ids] ** parameters['alpha']
+
+        # gather the candidates of each ant into a padded (ants x max degree) table
+        lo = edges.offsets[self.cur_node]
+        degree = edges.offsets[self.cur_node + 1] - lo
+        columns = np.arange(degree.max())
+        valid = columns < degree[:, None]
+        candidates = np.where(valid, lo[:, None] + columns, lo[:, None])
+        # closed half-edges have no weight, even with alpha 0
+        probs = np.where(valid & ~edges.closed[candidates], weights[candidates], 0.0)
+
+        # weight towards the destination of each ant
+        if self.heuristic is not None:
+            probs *= self.heuristic.factors(edges, candidates, self.dst_node, parameters)
+
+        # if the candidate was visited in last move, do not take it
+        no_backtrack = (self.prev_node != self.cur_node) & (self.cur_node != self.dst_node) & (degree > 1)
+        probs[no_backtrack[:, None] & (edges.neighbors[candidates] == self.prev_node[:, None])] = 0
+
+        # if there is only one possible candidate, take it unless it is closed
+        probs[(degree == 1) & ~edges.closed[lo], 0] = 1
+
+        # without any weight left, e.g. with all other candidates closed, see EdgeStore.fallbackChoice()
+        stuck = np.flatnonzero(probs.sum(axis=1) == 0)
+        if len(stuck):
+            back = np.where(self.edge[stuck] >= 0, edges.reverse[self.edge[stuck]], -1)
+            probs[stuck, edges.fallbackChoice(candidates[stuck], valid[stuck], back)] = 1
+
+        # sample all ants at once by inverting their cumulative weights
+        cumulative = probs.cumsum(axis=1)
+        samples = self.random.uniforms(len(self)) * cumulative[:, -1]
+        choice = np.minimum((cumulative <= samples[:, None]).sum(axis=1), degree - 1)
+        return lo + choice
+
+    def depositPheromones(self, edges, parameters, ahead):
+        """
+        Deposits pheromones on the current edges of all ants with the same
+        rule as Ant.depositPheromones(), adding up the growth of ants sharing an edge
+
+        Arguments:
+            edges: EdgeStore with all data about nodes & edges
+            parameters: dict of all steering parameters
+            ahead: number of other ants each ant finds on its current edge
+                when moving one after another, see move()
+        """
+        edge_ids = edges.edge_ids[self.edge]
+        cur_vol = edges.cur_vol[edge_ids] + ahead
+        max_vol = edges.max_vol[self.edge]
+        neighbors = edges.offsets[self.cur_node + 1] - edges.offsets[self.cur_node]
+
+        # add costs for current edges to the overall sums for statistics
+        self.cost_sum += edges.costs[self.edge]
+
+        # deposite pheromones only if there is capacity available on current edge and it is not a dead end
+        deposit = (cur_vol <= max_vol) & (neighbors > 1)
+        cost = edges.costs[self.edge] + 1
+        growth = (edges.raw_pheromones[edge_ids]/cost)*((max_vol-cur_vol)/(max_vol+1))*parameters["enhancement_rate"]
+        edges.raw_pheromones += np.bincount(edge_ids[deposit], weights=growth[deposit], minlength=len(edges.raw_pheromones))
+        edges.invalidateWeights()
+
+    def move(self, edges, parameters):
+        """
+        Executes one move of every ant and updates volumes and pheromones in edges
+
+        Arguments:
+            edges: EdgeStore with all data about nodes & edges
+            parameters: dict of all steering parameters
+        """
+        next_edges = self.findNext(edges, parameters)
+
+        numbers = np.arange(len(self))
+        moved = self.edge >= 0
+        old_ids = np.where(moved, edges.edge_ids[self.edge], -1)
+        new_ids = edges.edge_ids[next_edges]
+
+        # moving ant by ant, an ant finds on its new edge the ants with a higher number
+        # which have not left it yet and the ants with a lower number which entered it before
+        old_keys = np.sort(old_ids * len(self) + numbers)
+        new_keys = np.sort(new_ids * len(self) + numbers)
+        keys = new_ids * len(self) + numbers
+        ahead = (np.searchsorted(old_keys, (new_ids + 1) * len(self)) - np.searchsorted(old_keys, keys, side='right')
+                 + np.searchsorted(new_keys, keys) - np.searchsorted(new_keys, new_ids * len(self)))
+
+        # leave the current edges, capacity does not drop below zero
+        edges.cur_vol -= np.bincount(old_ids[moved], minlength=len(edges.cur_vol))
+        np.maximum(edges.cur_vol, 0, out=edges.cur_vol)
+
+        self.prev_node = self.cur_node
+        self.cur_node = edges.neighbors[next_edges]
+        self.edge = next_edges
+
+        # update pheromones on the current edges
+        self.depositPheromones(edges, parameters, ahead)
+
+        # increment current volume on the new current edges
+        edges.cur_vol += np.bincount(edges.edge_ids[self.edge], minlength=len(edges.cur_vol))
+
+        # ants at their destination turn back and record the cost of the trip
+        arrived = np.flatnonzero(self.cur_node == self.dst_node)
+        for k in arrived:
+            self.passes[k].append(self.cost_sum[k].item())
+        self.statistics.update(arrived, self.cost_sum[arrived])
+        self.last_pass[arrived] = self.cost_sum[arrived]
+        self.src_node[arrived], self.dst_node[arrived] = self.dst_node[arrived], self.src_node[arrived]
+        self.cost_sum[arrived] = 0.0
@@ -0,0 +1,59 @@
+import json
+
+"""
+Experiment configs: a parameter dict of Graph stored as a JSON or TOML file,
+the format is chosen by the file extension. An optional sweep table holds
+the arguments of performSweep() for the parameters:
+
+    steps = 100
+    ...
+    [sweep]
+    replicas = 4
+    [sweep.grid]
+    evaporation_rate = [0.01, 0.05]
+"""
+
+def loadConfig(path):
+    """
+    Reads a config file
+
+    Arguments:
+        path: .toml file, any other file is read as JSON
+
+    Return:
+        parameters: dict of parameters for Graph
+        sweep: dict of the sweep table, empty if there is none
+    """
+    if path.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(path, 'rb') as f:
+            parameters = tomllib.load(f)
+    else:
+        with open(path) as f:
+            parameters = json.load(f)
+
+    # both formats only have string keys, the dense tables are indexed by node numbers
+    for key in ('costs', 'max_vols'):
+        if isinstance(parameters.get(key), dict):
+            parameters[key] = {int(u): {int(v): value for v, value in row.items()}
+                               for u, row in parameters[key].items()}
+    sweep = parameters.pop('sweep', {})
+    return parameters, sweep
+
+def parseOverride(text):
+    """
+    Parses an override given as key=value, the value as JSON if possible, as string otherwise
+
+    Return:
+        key, value
+    """
+    key, separator, value = text.partition('=')
+    if not separator:
+        raise ValueError("override has to be given as key=value, not '" + text + "'")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
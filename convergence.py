@@ -0,0 +1,74 @@
+import numpy as np
+from recorder import Recorder
+
+class ConvergenceMonitor(Recorder):
+    """
+    Recorder watching a simulation for convergence: after every step it
+    compares the distribution of pheromones over the edges and the mean cost
+    of the last completed trips of the ants with those window steps before.
+    Once both changed relatively by less than tolerance in patience
+    consecutive steps, the run is converged and performSimulation() stops
+
+    Attributes:
+        - tolerance: largest relative change regarded as stable
+        - window: number of steps over which the changes are measured
+        - patience: number of consecutive stable steps needed
+        - norm: 'l1' or 'linf', norm in which the change of pheromones is measured
+        - distributions: (window x edges) ring buffer of the last pheromone distributions
+        - costs: ring buffer of the last mean costs of the last trips, nan while there are none
+        - count: number of steps recorded so far
+        - pheromone_change, cost_change: relative changes over the last window
+        - stable_steps: number of consecutive stable steps so far
+        - converged_step: step at which the run converged, None as long as it did not
+
+    Methods:
+        - record(graph): measures the changes up to the last step of graph
+        - converged() -> whether the run converged
+    """
+    def __init__(self, tolerance, window=10, patience=10, norm='l1'):
+        super().__init__(1)
+        if norm not in ('l1', 'linf'):
+            raise ValueError("norm has to be 'l1' or 'linf', not '" + str(norm) + "'")
+        self.tolerance = tolerance
+        self.window = window
+        self.patience = patience
+        self.norm = norm
+        self.distributions = None
+        self.costs = np.full(window, np.nan)
+        self.count = 0
+        self.pheromone_change, self.cost_change = np.inf, np.inf
+        self.stable_steps = 0
+        self.converged_step = None
+
+    def record(self, graph):
+        # evaporation scales all levels alike, so the distribution does not
+        # depend on the decay which is not folded into raw_pheromones yet
+        raw_pheromones = graph.edges.raw_pheromones
+        distribution = raw_pheromones / raw_pheromones.sum()
+        last_pass = graph.colony.last_pass[~np.isnan(graph.colony.last_pass)]
+        cost = last_pass.mean() if len(last_pass) else np.nan
+
+        if self.distributions is None:
+            self.distributions = np.empty((self.window, len(distribution)))
+        slot = self.count % self.window
+        if self.count >= self.window:
+            change = np.abs(distribution - self.distributions[slot])
+            if self.norm == 'l1':
+                self.pheromone_change = change.sum()
+            else:
+                self.pheromone_change = change.max() / self.distributions[slot].max()
+            # runs without completed trips are never stable
+            self.cost_change = abs(cost - self.costs[slot]) / self.costs[slot] if self.costs[slot] > 0 else np.inf
+        self.distributions[slot] = distribution
+        self.costs[slot] = cost
+        self.count += 1
+
+        if self.pheromone_change < self.tolerance and self.cost_change < self.tolerance:
+            self.stable_steps += 1
+        else:
+            self.stable_steps = 0
+        if self.stable_steps >= self.patience and self.converged_step is None:
+            self.converged_step = graph.step
+
+    def converged(self):
+        return self.converged_step is not None
@@ -0,0 +1,520 @@
+import numpy as np
+import os
+from collections.abc import Mapping
+
+class EdgeStore:
+    """
+    Compact array storage of the street network and of the state of its edges
+
+    The adjacency is kept in CSR form: the neighbors of node u are
+    neighbors[offsets[u]:offsets[u+1]], every entry being one direction of an
+    edge (a half-edge). Pheromones and current volumes are always shared by
+    both directions of an edge, so they are stored once per undirected edge
+    and reached through edge_ids. Costs and maximum volumes may differ per
+    direction and are stored per half-edge.
+
+    Evaporation is lazy: raw_pheromones holds the pheromone levels up to a
+    common factor decay, so evaporating is a single multiplication of decay.
+    Routing and deposits are proportional to the pheromone levels and work on
+    raw_pheromones directly, the factor is folded into the stored values only
+    when the actual levels are read through pheromones.
+
+    Attributes:
+        - offsets: start of the neighbor list of each node, length nodes+1
+        - neighbors: target node of each half-edge
+        - edge_ids: index of the undirected edge of each half-edge
+        - reverse: index of the half-edge going in the opposite direction
+        - costs: cost of each half-edge
+        - max_vol: maximum volume of each half-edge
+        - raw_pheromones: pheromone level of each undirected edge up to the factor decay
+        - decay: common factor of all pheromone levels not yet folded into raw_pheromones
+        - pheromones: actual pheromone level of each undirected edge
+        - cur_vol: current volume of each undirected edge
+        - closed: whether each half-edge is closed by an event, closed half-edges
+            are taken only by vehicles which have no other way at all
+        - replicas: number of independent copies of the network in the store,
+            see replicate()
+        - initial_costs, initial_max_vol: copies of costs and max_vol made before
+            they were first changed, None as long as they are unchanged
+        - cumulative_weights: cache of cumulative pheromone^alpha weights of
+            the half-edges of each node, see cumulativeWeights()
+
+    Methods:
+        - fromNetworkx(graph, parameters) -> EdgeStore:
+            builds the store from a networkx graph, keeping its neighbor order
+        - fromEdgeList(node_number, sources, targets, ...) -> EdgeStore:
+            builds the store from arrays of edges and their attributes in one pass
+        - save(directory, network): writes all arrays of the store as .npy files,
+            those of the network only if network is set
+        - load(directory, mmap_mode, network_directory) -> EdgeStore:
+            reads a store written by save(), memory-mapping its arrays
+        - saveNetwork(directory): writes the arrays of the network as .npy files
+        - loadNetwork(directory, init_pheromon, mmap_mode) -> EdgeStore:
+            maps a network written by saveNetwork() read-only into memory
+        - replicate(replicas) -> EdgeStore with replicas independent copies of the network
+        - replicaMean() -> EdgeStore of the network with the state averaged over the replicas
+        - replica(nodes) -> copy of the network each of the nodes belongs to
+        - replicaNodes(u) -> node u in each copy of the network
+        - halfEdge(u, v) -> index of the half-edge going from u to v
+        - degree(u) -> number of neighbors of u
+        - endpoints() -> arrays with the smaller and the larger node of each undirected edge
+        - cumulativeWeights(node, alpha) -> cumulative weights of the half-edges of node
+        - fallbackChoice(candidates, valid, back) -> candidate taken by vehicles
+            whose candidates have no weight left
+        - invalidateWeights(*nodes): drops cached weights of the given nodes, of all if none given
+        - keepInitial(): keeps copies of costs and max_vol before they are changed
+        - reset(init_pheromon): restores initial pheromone levels, costs and
+            maximum volumes and empties all edges
+        - evaporate(rate, times): decreases all pheromone levels by the given rate
+            the given number of times in O(1)
+        - asDict() -> read only graph_data compatible view of the store
+        - toDict() -> copy of the current state in the graph_data layout
+
+    """
+    def __init__(self, offsets, neighbors, edge_ids, reverse, costs, max_vol, init_pheromon, edge_number=None):
+
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.edge_ids = edge_ids
+        self.reverse = reverse
+        self.costs = costs
+        self.max_vol = max_vol
+
+        if edge_number is None:
+            edge_number = int(edge_ids.max()) + 1 if len(edge_ids) > 0 else 0
+        self.raw_pheromones = np.full(edge_number, init_pheromon, dtype=np.float64)
+        self.decay = 1.0
+        self.cur_vol = np.zeros(edge_number, dtype=np.int64)
+        self.closed = np.zeros(len(neighbors), dtype=bool)
+        self.replicas = 1
+        self.initial_costs, self.initial_max_vol = None, None
+        self.cumulative_weights = {}
+
+    @classmethod
+    def fromNetworkx(cls, graph, parameters):
+        """
+        Builds the store from a networkx graph whose nodes are 0..n-1
+        Costs and maximum volumes are 1 or taken from the dense tables
+        in parameters, if custom_weights is set
+
+        Arguments:
+            graph: networkx graph with the street network
+            parameters: dict of all steering parameters
+
+        Return:
+            EdgeStore with initial pheromone levels and empty edges
+        """
+        node_number = len(graph.nodes)
+        offsets = np.zeros(node_number + 1, dtype=np.int64)
+        neighbors, costs, max_vol = [], [], []
+
+        for node in range(node_number):
+            for edge in graph.neighbors(node):
+                neighbors.append(edge)
+                if not parameters['custom_weights']:
+                    costs.append(1)
+                    max_vol.append(1)
+                else:
+                    costs.append(parameters['costs'][node][edge])
+                    max_vol.append(parameters['max_vols'][node][edge])
+            offsets[node + 1] = len(neighbors)
+
+        # pair both directions of each edge and give them a common edge id
+        half_edges = {}
+        edge_ids = np.zeros(len(neighbors), dtype=np.int64)
+        reverse = np.zeros(len(neighbors), dtype=np.int64)
+        edge_number = 0
+        for node in range(node_number):
+            for index in range(offsets[node], offsets[node + 1]):
+                edge = neighbors[index]
+                if (edge, node) in half_edges:
+                    reverse[index] = half_edges[(edge, node)]
+                    reverse[reverse[index]] = index
+                    edge_ids[index] = edge_ids[reverse[index]]
+                else:
+                    reverse[index] = index
+                    edge_ids[index] = edge_number
+                    edge_number += 1
+                half_edges[(node, edge)] = index
+
+        return cls(offsets, np.asarray(neighbors, dtype=np.int64), edge_ids, reverse,
+                   np.asarray(costs, dtype=np.float64), np.asarray(max_vol, dtype=np.float64),
+                   parameters['init_pheromon'])
+
+    @classmethod
+    def fromEdgeList(cls, node_number, sources, targets, costs=None, max_vols=None,
+                     costs_back=None, max_vols_back=None, init_pheromon=1):
+        """
+        Builds the store from a list of undirected edges, memory and time
+        scale with the number of edges only. The neighbors of each node are
+        ordered as the edges are listed, like networkx does. Self loops are dropped
+
+        Arguments:
+            node_number: number of nodes, nodes are 0..node_number-1
+            sources, targets: arrays with the two end nodes of each edge
+            costs, max_vols: arrays with the cost and maximum volume of each edge
+              in the direction source -> target, 1 if not given
+            costs_back, max_vols_back: the same in the direction target -> source,
+              equal to costs and max_vols if not given
+            init_pheromon: initial pheromone level of all edges
+
+        Return:
+            EdgeStore with initial pheromone levels and empty edges
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        costs = np.ones(len(sources)) if costs is None else np.asarray(costs, dtype=np.float64)
+        max_vols = np.ones(len(sources)) if max_vols is None else np.asarray(max_vols, dtype=np.float64)
+        costs_back = costs if costs_back is None else np.asarray(costs_back, dtype=np.float64)
+        max_vols_back = max_vols if max_vols_back is None else np.asarray(max_vols_back, dtype=np.float64)
+
+        keep = sources != targets
+        if not keep.all():
+            sources, targets = sources[keep], targets[keep]
+            costs, max_vols, costs_back, max_vols_back = costs[keep], max_vols[keep], costs_back[keep], max_vols_back[keep]
+
+        # half-edges 2i and 2i+1 are both directions of edge i, sorting them stably
+        # by their source keeps the neighbors of each node in the order of the edges
+        half_sources = np.stack([sources, targets], axis=1).ravel()
+        half_targets = np.stack([targets, sources], axis=1).ravel()
+        order = np.argsort(half_sources, kind='stable')
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+
+        offsets = np.zeros(node_number + 1, dtype=np.int64)
+        np.cumsum(np.bincount(half_sources, minlength=node_number), out=offsets[1:])
+
+        return cls(offsets, half_targets[order], order // 2, position[order ^ 1],
+                   np.stack([costs, costs_back], axis=1).ravel()[order],
+                   np.stack([max_vols, max_vols_back], axis=1).ravel()[order],
+                   init_pheromon)
+
+    arrays = ('offsets', 'neighbors', 'edge_ids', 'reverse', 'costs', 'max_vol', 'raw_pheromones', 'cur_vol', 'closed')
+
+    # arrays describing the network itself, the others are the state of a run
+    network_arrays = ('offsets', 'neighbors', 'edge_ids', 'reverse', 'costs', 'max_vol')
+
+    def save(self, directory, network=True):
+        """
+        Writes all arrays of the store and the factor decay as .npy files to directory
+        Without network, the arrays of the network are left out, only costs and
+        maximum volumes are written if they were changed
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self.arrays:
+            if not network and name in self.network_arrays and (name not in ('costs', 'max_vol') or self.initial_costs is None):
+                continue
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+        np.save(os.path.join(directory, "decay.npy"), self.decay)
+        np.save(os.path.join(directory, "replicas.npy"), self.replicas)
+        # without network the initial costs and maximum volumes are those of the network
+        if self.initial_costs is not None and network:
+            np.save(os.path.join(directory, "initial_costs.npy"), self.initial_costs)
+            np.save(os.path.join(directory, "initial_max_vol.npy"), self.initial_max_vol)
+
+    def saveNetwork(self, directory):
+        """
+        Writes the arrays of the network as .npy files to directory, to be
+        memory-mapped by loadNetwork() instead of building the network again
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self.network_arrays:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+        np.save(os.path.join(directory, "edge_number.npy"), len(self.raw_pheromones))
+
+    @classmethod
+    def loadNetwork(cls, directory, init_pheromon, mmap_mode='r'):
+        """
+        Maps a network written by saveNetwork() into memory in O(1): the arrays of
+        the network stay in the files and are shared read-only by all processes
+        using them, only pheromone levels and current volumes are allocated.
+        Costs and maximum volumes are copied into memory once they are changed,
+        see keepInitial()
+
+        Arguments:
+            directory: directory the network was saved to
+            init_pheromon: initial pheromone level of all edges
+            mmap_mode: mode passed to numpy.load, None reads the arrays into memory
+
+        Return:
+            EdgeStore with initial pheromone levels and empty edges
+        """
+        network = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+                   for name in cls.network_arrays}
+        edge_number = int(np.load(os.path.join(directory, "edge_number.npy")))
+        return cls(**network, init_pheromon=init_pheromon, edge_number=edge_number)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='c', network_directory=None):
+        """
+        Reads a store written by save(). With the default copy-on-write mode
+        the arrays are memory-mapped: nothing is read before it is used and
+        changes stay in memory without touching the files
+
+        Arguments:
+            directory: directory the store was saved to
+            mmap_mode: mode passed to numpy.load, None reads the arrays into memory
+            network_directory: directory of a network written by saveNetwork(),
+              read-only mapped for the arrays saved without network
+
+        Return:
+            EdgeStore in the saved state
+        """
+        edges = cls.__new__(cls)
+        for name in cls.arrays:
+            path = os.path.join(directory, name + ".npy")
+            # stores saved before closures were kept have no closed edges
+            if name == 'closed' and not os.path.exists(path):
+                edges.closed = np.zeros(len(edges.neighbors), dtype=bool)
+            elif network_directory is not None and not os.path.exists(path):
+                setattr(edges, name, np.load(os.path.join(network_directory, name + ".npy"), mmap_mode='r'))
+            else:
+                setattr(edges, name, np.load(path, mmap_mode=mmap_mode))
+        edges.decay = float(np.load(os.path.join(directory, "decay.npy")))
+        replicas = os.path.join(directory, "replicas.npy")
+        edges.replicas = int(np.load(replicas)) if os.path.exists(replicas) else 1
+        edges.initial_costs, edges.initial_max_vol = None, None
+        if os.path.exists(os.path.join(directory, "initial_costs.npy")):
+            edges.initial_costs = np.load(os.path.join(directory, "initial_costs.npy"))
+            edges.initial_max_vol = np.load(os.path.join(directory, "initial_max_vol.npy"))
+        # changed costs saved without the network were those of the network at first,
+        # a store saved with its network, e.g. replicas of it, has its own initial ones
+        elif (network_directory is not None and os.path.exists(os.path.join(directory, "costs.npy"))
+              and not os.path.exists(os.path.join(directory, "offsets.npy"))):
+            edges.initial_costs = np.load(os.path.join(network_directory, "costs.npy"), mmap_mode='r')
+            edges.initial_max_vol = np.load(os.path.join(network_directory, "max_vol.npy"), mmap_mode='r')
+        edges.cumulative_weights = {}
+        return edges
+
+    def replicate(self, replicas):
+        """
+        Returns a store holding replicas disjoint copies of this network in its
+        current state: node u of copy r is node u + r*nodes, its half-edges and
+        edges are shifted alike. Moving the ants of all copies in one pass runs
+        independent simulations, and the arrays of each edge attribute can be
+        viewed with a leading replica axis by reshape(replicas, -1)
+        """
+        node_number = len(self.offsets) - 1
+        half_edge_number = len(self.neighbors)
+        edge_number = len(self.raw_pheromones)
+        shift = np.arange(replicas)[:, None]
+        edges = EdgeStore(np.append((self.offsets[:-1] + shift * half_edge_number).ravel(), replicas * half_edge_number),
+                          (self.neighbors + shift * node_number).ravel(),
+                          (self.edge_ids + shift * edge_number).ravel(),
+                          (self.reverse + shift * half_edge_number).ravel(),
+                          np.tile(self.costs, replicas), np.tile(self.max_vol, replicas),
+                          0, replicas * edge_number)
+        edges.raw_pheromones = np.tile(self.pheromones, replicas)
+        edges.cur_vol = np.tile(self.cur_vol, replicas)
+        edges.closed = np.tile(self.closed, replicas)
+        edges.replicas = replicas * self.replicas
+        return edges
+
+    def replicaMean(self):
+        """
+        Returns a store of the network of a single replica, its nodes numbered
+        as in the original network, whose pheromone levels and current volumes
+        are the means over all replicas; the store itself if it has no replicas.
+        Events change all replicas alike, so costs and maximum volumes are those of copy 0
+        """
+        if self.replicas == 1:
+            return self
+        node_number = (len(self.offsets) - 1) // self.replicas
+        half_edge_number = len(self.neighbors) // self.replicas
+        edges = EdgeStore(self.offsets[:node_number + 1], self.neighbors[:half_edge_number],
+                          self.edge_ids[:half_edge_number], self.reverse[:half_edge_number],
+                          self.costs[:half_edge_number], self.max_vol[:half_edge_number],
+                          0, len(self.raw_pheromones) // self.replicas)
+        edges.raw_pheromones = self.pheromones.reshape(self.replicas, -1).mean(axis=0)
+        edges.cur_vol = self.cur_vol.reshape(self.replicas, -1).mean(axis=0)
+        edges.closed = self.closed[:half_edge_number]
+        return edges
+
+    def replica(self, nodes):
+        return np.asarray(nodes) // ((len(self.offsets) - 1) // self.replicas)
+
+    def replicaNodes(self, u):
+        return u + np.arange(self.replicas) * ((len(self.offsets) - 1) // self.replicas)
+
+    def halfEdge(self, u, v):
+        lo, hi = self.offsets[u], self.offsets[u + 1]
+        return lo + int(np.flatnonzero(self.neighbors[lo:hi] == v)[0])
+
+    def degree(self, u):
+        return self.offsets[u + 1] - self.offsets[u]
+
+    def endpoints(self):
+        sources = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        forward = sources <= self.neighbors
+        u = np.zeros(len(self.raw_pheromones), dtype=np.int64)
+        v = np.zeros(len(self.raw_pheromones), dtype=np.int64)
+        u[self.edge_ids[forward]] = sources[forward]
+        v[self.edge_ids[forward]] = self.neighbors[forward]
+        return u, v
+
+    def cumulativeWeights(self, node, alpha):
+        """
+        Returns the cumulative sums of raw_pheromones^alpha over the half-edges of node,
+        closed half-edges have no weight even with alpha 0. They are cached until pheromones of an edge of node are changed, since
+        evaporation scales all weights alike, it does not invalidate them
+
+        Arguments:
+            node: node whose half-edges are weighted
+            alpha: importance of pheromones
+
+        Return:
+            array of cumulative weights in the order of the neighbors of node
+        """
+        if node not in self.cumulative_weights:
+            lo, hi = self.offsets[node], self.offsets[node + 1]
+            weights = np.where(self.closed[lo:hi], 0.0, self.raw_pheromones[self.edge_ids[lo:hi]] ** alpha)
+            self.cumulative_weights[node] = np.cumsum(weights)
+        return self.cumulative_weights[node]
+
+    def fallbackChoice(self, candidates, valid, back):
+        """
+        Returns the candidate taken by vehicles none of whose candidates has any
+        weight left: the last open one which does not lead back, else the way back
+        if it is open; only a vehicle without any open candidate takes the last one
+
+        Arguments:
+            candidates: (vehicles x max degree) table of the next half-edges of each vehicle
+            valid: mask of the entries of candidates which are actual half-edges
+            back: half-edge leading back the way each vehicle came, -1 if there is none
+
+        Return:
+            column of candidates taken by each vehicle
+        """
+        columns = np.arange(candidates.shape[1])
+        open_edges = valid & ~self.closed[candidates]
+        leading_back = candidates == np.asarray(back)[:, None]
+        choice = np.where(open_edges & ~leading_back, columns, -1).max(axis=1)
+        choice = np.where(choice < 0, np.where(open_edges & leading_back, columns, -1).max(axis=1), choice)
+        return np.where(choice < 0, np.where(valid, columns, -1).max(axis=1), choice)
+
+    def invalidateWeights(self, *nodes):
+        if not nodes:
+            self.cumulative_weights.clear()
+        for node in nodes:
+            self.cumulative_weights.pop(node, None)
+
+    def keepInitial(self):
+        if self.initial_costs is None:
+            # read-only mapped arrays of a network stay the initial ones,
+            # the changes are made to copies in memory
+            if self.costs.flags.writeable and self.max_vol.flags.writeable:
+                self.initial_costs, self.initial_max_vol = self.costs.copy(), self.max_vol.copy()
+            else:
+                self.initial_costs, self.initial_max_vol = self.costs, self.max_vol
+                self.costs, self.max_vol = np.array(self.costs), np.array(self.max_vol)
+
+    def reset(self, init_pheromon):
+        if self.initial_costs is not None:
+            self.costs[:], self.max_vol[:] = self.initial_costs, self.initial_max_vol
+        self.raw_pheromones.fill(init_pheromon)
+        self.decay = 1.0
+        self.cur_vol.fill(0)
+        self.closed.fill(False)
+        self.cumulative_weights.clear()
+
+    @property
+    def pheromones(self):
+        # the levels may be written through the returned array
+        self.cumulative_weights.clear()
+        if self.decay != 1.0:
+            self.raw_pheromones *= self.decay
+            self.decay = 1.0
+        return self.raw_pheromones
+
+    def evaporate(self, rate, times=1):
+        """
+        Decreases pheromone level on each edge by the given rate
+        the given number of times, only the common factor is updated
+
+        Arguments:
+            rate: evaporation rate
+            times: how many times to evaporate
+        """
+        self.decay *= (1 - rate) ** times
+
+        # fold the factor in before it underflows
+        if self.decay < 1e-100:
+            self.pheromones
+
+    def asDict(self):
+        return GraphDataView(self)
+
+    def toDict(self):
+        neighbors = self.neighbors.tolist()
+        values = {'pheromones': self.pheromones[self.edge_ids].tolist(),
+                  'costs': self.costs.tolist(),
+                  'cur_vol': self.cur_vol[self.edge_ids].tolist(),
+                  'max_vol': self.max_vol.tolist()}
+        graph_data = {}
+        for node in range(len(self.offsets) - 1):
+            lo, hi = self.offsets[node], self.offsets[node + 1]
+            graph_data[node] = {attribute: dict(zip(neighbors[lo:hi], values[attribute][lo:hi])) for attribute in values}
+        return graph_data
+
+
+class GraphDataView(Mapping):
+    """
+    Read only view of an EdgeStore in the former graph_data layout:
+    graph_data[node]['pheromones'|'costs'|'cur_vol'|'max_vol'][neighbor]
+    """
+    def __init__(self, edges):
+        self.edges = edges
+
+    def __getitem__(self, node):
+        if not 0 <= node < len(self):
+            raise KeyError(node)
+        return _NodeView(self.edges, node)
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __len__(self):
+        return len(self.edges.offsets) - 1
+
+
+class _NodeView(Mapping):
+
+    attributes = ('pheromones', 'costs', 'cur_vol', 'max_vol')
+
+    def __init__(self, edges, node):
+        self.edges = edges
+        self.node = node
+
+    def __getitem__(self, attribute):
+        if attribute not in self.attributes:
+            raise KeyError(attribute)
+        return _NodeAttributeView(self.edges, self.node, attribute)
+
+    def __iter__(self):
+        return iter(self.attributes)
+
+    def __len__(self):
+        return len(self.attributes)
+
+
+class _NodeAttributeView(Mapping):
+
+    def __init__(self, edges, node, attribute):
+        self.edges = edges
+        self.lo, self.hi = edges.offsets[node], edges.offsets[node + 1]
+        self.attribute = attribute
+
+    def __getitem__(self, neighbor):
+        index = np.flatnonzero(self.edges.neighbors[self.lo:self.hi] == neighbor)
+        if len(index) == 0:
+            raise KeyError(neighbor)
+        half_edge = self.lo + index[0]
+        if self.attribute in ('pheromones', 'cur_vol'):
+            return getattr(self.edges, self.attribute)[self.edges.edge_ids[half_edge]].item()
+        return getattr(self.edges, self.attribute)[half_edge].item()
+
+    def __iter__(self):
+        return iter(self.edges.neighbors[self.lo:self.hi].tolist())
+
+    def __len__(self):
+        return int(self.hi - self.lo)
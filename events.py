@@ -0,0 +1,152 @@
+import heapq
+import numpy as np
+
+"""
+Scheduled scenario events. An event is a dict with the step before which it
+is applied, its type and the values it needs, e.g.
+
+    {'step': 20, 'type': 'close', 'edges': [(7, 8)]}
+
+Types of events and their keys:
+
+    - close: edges                 edges lose all pheromones and are closed, no vehicle
+                                   enters them unless it has no other way at all
+    - reopen: edges[, pheromones]  edges are opened and get pheromones again,
+                                   init_pheromon by default
+    - reset_pheromones: edges[, pheromones]
+                                   sets the pheromone level of edges, 0.0000001 by default
+    - max_vol: edges, value        sets the maximum volume of both directions of edges
+    - cost: edges, value           sets the cost of both directions of edges
+    - add_demand: src, dst, ants   spawns ants travelling between src and dst
+    - remove_demand: src, dst, ants
+                                   removes ants travelling between src and dst
+    - evaporation_rate: value      changes the evaporation rate
+
+Events are kept in an EventQueue sorted by step, a Graph applies the events
+which are due once before each step. Edges and nodes of events refer to the
+network, with replicas they apply to every copy of it. Closures, reopenings
+and cost changes also update the distances of the routing heuristic, if
+there is one (see heuristic.py).
+"""
+
+class EventQueue:
+    """
+    Priority queue of scheduled events, events with the same step
+    are handed out in the order they were pushed
+
+    Attributes:
+        - heap: heap of (step, sequence number, event) entries
+        - count: number of events pushed so far
+
+    Methods:
+        - push(event): schedules an event
+        - due(step) -> list of events scheduled for step or before, removed from the queue
+    """
+    def __init__(self, events=()):
+
+        self.heap = []
+        self.count = 0
+        for event in events:
+            self.push(event)
+
+    def push(self, event):
+        if event['type'] not in HANDLERS:
+            raise ValueError("unknown event type '" + str(event['type']) + "'")
+        heapq.heappush(self.heap, (event['step'], self.count, event))
+        self.count += 1
+
+    def due(self, step):
+        events = []
+        while self.heap and self.heap[0][0] <= step:
+            events.append(heapq.heappop(self.heap)[2])
+        return events
+
+    def __len__(self):
+        return len(self.heap)
+
+def _halfEdges(edges, event):
+    """
+    Returns the indices of both half-edges of each edge of an event, in every replica
+    """
+    half_edges = np.array([edges.halfEdge(ru, rv) for u, v in event['edges']
+                           for ru, rv in zip(edges.replicaNodes(u), edges.replicaNodes(v))], dtype=np.int64)
+    return np.concatenate([half_edges, edges.reverse[half_edges]])
+
+def _setPheromones(graph, event, default):
+    edges = graph.edges
+    edges.pheromones[edges.edge_ids[_halfEdges(edges, event)]] = event.get('pheromones', default)
+
+def _close(graph, event):
+    _setPheromones(graph, event, 0.0)
+    graph.edges.closed[_halfEdges(graph.edges, event)] = True
+    graph.edges.invalidateWeights()
+    # the distances of the heuristic go around closed edges
+    if graph.heuristic is not None:
+        graph.heuristic.update(graph.edges, _halfEdges(graph.edges, event), blocked=True)
+
+def _reopen(graph, event):
+    _setPheromones(graph, event, graph.parameters['init_pheromon'])
+    graph.edges.closed[_halfEdges(graph.edges, event)] = False
+    graph.edges.invalidateWeights()
+    if graph.heuristic is not None:
+        graph.heuristic.update(graph.edges, _halfEdges(graph.edges, event), blocked=False)
+
+def _resetPheromones(graph, event):
+    _setPheromones(graph, event, 0.0000001)
+
+def _setMaxVol(graph, event):
+    graph.edges.keepInitial()
+    graph.edges.max_vol[_halfEdges(graph.edges, event)] = event['value']
+
+def _setCost(graph, event):
+    graph.edges.keepInitial()
+    half_edges = _halfEdges(graph.edges, event)
+    old_costs = graph.edges.costs[half_edges]
+    graph.edges.costs[half_edges] = event['value']
+    if graph.heuristic is not None:
+        graph.heuristic.update(graph.edges, half_edges, old_costs)
+
+def _addDemand(graph, event):
+    if graph.parameters.get('aggregate', False):
+        raise ValueError("demand events are not supported in aggregate mode")
+    edges = graph.edges
+    graph.colony.addAnts(np.repeat(edges.replicaNodes(event['src']), event['ants']),
+                         np.repeat(edges.replicaNodes(event['dst']), event['ants']))
+    graph.updateAnts()
+
+def _removeDemand(graph, event):
+    if graph.parameters.get('aggregate', False):
+        raise ValueError("demand events are not supported in aggregate mode")
+    colony, edges = graph.colony, graph.edges
+    removed = []
+    for src, dst in zip(edges.replicaNodes(event['src']), edges.replicaNodes(event['dst'])):
+        pair = {src, dst}
+        # ants on their way back have src and dst swapped, the last spawned ants are removed first
+        matching = [k for k in range(len(colony)) if {colony.src_node[k], colony.dst_node[k]} == pair]
+        removed += matching[len(matching) - min(event['ants'], len(matching)):]
+    removed = np.array(removed, dtype=np.int64)
+
+    # removed ants leave their current edges
+    on_edge = removed[colony.edge[removed] >= 0]
+    edges.cur_vol -= np.bincount(edges.edge_ids[colony.edge[on_edge]], minlength=len(edges.cur_vol))
+    np.maximum(edges.cur_vol, 0, out=edges.cur_vol)
+    colony.removeAnts(removed)
+    graph.updateAnts()
+
+def _setEvaporationRate(graph, event):
+    graph.parameters['evaporation_rate'] = event['value']
+
+HANDLERS = {'close': _close,
+            'reopen': _reopen,
+            'reset_pheromones': _resetPheromones,
+            'max_vol': _setMaxVol,
+            'cost': _setCost,
+            'add_demand': _addDemand,
+            'remove_demand': _removeDemand,
+            'evaporation_rate': _setEvaporationRate}
+
+def applyEvent(graph, event):
+    """
+    Applies a single event to graph
+    """
+    HANDLERS[event['type']](graph, event)
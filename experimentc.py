@@ -1,8 +1,7 @@
 from graph import Graph
-import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-from matplotlib import cm
+from sweep import performSweep, performSuccessiveHalving
+from config import loadConfig
+import os
 """
 parameters:
     ant_number: amount of ants on the graph
@@ -26,119 +25,56 @@ parameters:
         pheromone = pheromone*(1 - evaporation_rate)
 
     edges: list of edges as tupels, works only if custom_graph == True
+        an edge may also carry its cost and maximum volume:
+        (from, to, cost, max_vol) or, if they differ per direction,
+        (from, to, cost, max_vol, cost_back, max_vol_back);
+        costs and max_vols are not needed then
     costs: list of costs: graph_data['costs'][from][to], 
         works only if custom_weights == True
     max_vols: list of maximum volumes of edges graph_data['max_vols'][from][to],
         works only if custom_weights == True
+    network_file: optional, file with a sparse network to use instead of edges,
+        see loaders.py
+    convergence_tolerance: optional, stop a simulation as soon as pheromones and
+        trip costs change relatively less than this, see convergence.py
+    events: optional, list of scenario events like closing edges or changing
+        capacities at given steps, see events.py
+
+The setups of the experiments are read from configs/, run other setups
+with cli.py
 
 """
-def getOptimalParameter():
-    resolution = 10
-    X = []
-    Y = []
-    Z = []
-    A = np.zeros((resolution, resolution))
-    for enhancement in range(resolution):
-        for evap in range(resolution):
-            parameters = {
-                'file_name': "example1.png",
-                'custom_graph': True,
-                'custom_weights': True,
-                'ant_number': 1,
-                'node_number': 9,
-                'steps': 100,
-                'src_nodes': [0],
-                'dst_nodes': [8],
-                'init_pheromon': 1,
-                'alpha': 1,
-                'beta': 1,
-                'gamma': 1,
-                'enhancement_rate': enhancement / resolution,
-                'evaporation_rate': evap / (resolution * 10),
 
-                'edges': [(0, 1), (0, 2), (1, 3), (1, 4), (2, 4), (2, 5), (3, 6), (4, 6), (4, 7), (6, 8), (7, 8)],
-                'edges_to_reset': [],
-                'step_to_reset': -1,
-                'costs': {0: {0: 1, 1: 2, 2: 10, 3: 0, 4: 0, 5: 0, 6: 0, 7: 0, 8: 0},
-                          1: {0: 2, 1: 1, 2: 0, 3: 1, 4: 2, 5: 0, 6: 0, 7: 0, 8: 0},
-                          2: {0: 10, 1: 0, 2: 1, 3: 0, 4: 10, 5: 10, 6: 0, 7: 0, 8: 0},
-                          3: {0: 0, 1: 3, 2: 0, 3: 1, 4: 0, 5: 0, 6: 1, 7: 0, 8: 0},
-                          4: {0: 0, 1: 2, 2: 10, 3: 0, 4: 1, 5: 0, 6: 10, 7: 2, 8: 0},
-                          5: {0: 0, 1: 0, 2: 10, 3: 0, 4: 0, 5: 1, 6: 0, 7: 0, 8: 0},
-                          6: {0: 0, 1: 0, 2: 0, 3: 1, 4: 10, 5: 0, 6: 1, 7: 0, 8: 10},
-                          7: {0: 0, 1: 0, 2: 0, 3: 0, 4: 2, 5: 0, 6: 0, 7: 1, 8: 2},
-                          8: {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0, 6: 10, 7: 2, 8: 1}},
+# the setups of the experiments, see configs/
+CONFIG_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs")
 
-                'max_vols': {0: {0: 1, 1: 2, 2: 10, 3: 0, 4: 0, 5: 0, 6: 0, 7: 0, 8: 0},
-                             1: {0: 2, 1: 1, 2: 0, 3: 1, 4: 2, 5: 0, 6: 0, 7: 0, 8: 0},
-                             2: {0: 10, 1: 0, 2: 1, 3: 0, 4: 10, 5: 10, 6: 0, 7: 0, 8: 0},
-                             3: {0: 0, 1: 3, 2: 0, 3: 1, 4: 0, 5: 0, 6: 1, 7: 0, 8: 0},
-                             4: {0: 0, 1: 2, 2: 10, 3: 0, 4: 1, 5: 0, 6: 10, 7: 2, 8: 0},
-                             5: {0: 0, 1: 0, 2: 10, 3: 0, 4: 0, 5: 1, 6: 0, 7: 0, 8: 0},
-                             6: {0: 0, 1: 0, 2: 0, 3: 1, 4: 10, 5: 0, 6: 1, 7: 0, 8: 10},
-                             7: {0: 0, 1: 0, 2: 0, 3: 0, 4: 2, 5: 0, 6: 0, 7: 1, 8: 2},
-                             8: {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0, 6: 10, 7: 2, 8: 1}}
-            }
+def getOptimalParameter(resolution=10, processes=None, image="img/optimal_parameter.png", adaptive=False):
+    parameters, _ = loadConfig(os.path.join(CONFIG_DIRECTORY, "optimal_parameter.toml"))
 
-            graph = Graph(parameters)
-            graph.performSimulation()
-            X.append(evap)
-            Y.append(enhancement)
-            Z.append(graph.getSolution())
-            A[evap, enhancement] = graph.getSolution()
-    index = np.unravel_index(np.argmin(A, axis=None), A.shape)
+    grid = {'evaporation_rate': [evap / (resolution * 10) for evap in range(resolution)],
+            'enhancement_rate': [enhancement / resolution for enhancement in range(resolution)]}
+    # successive halving simulates only the promising cells for all steps, without a heatmap
+    if adaptive:
+        best, _ = performSuccessiveHalving(parameters, grid, processes=processes)
+        print(best['evaporation_rate'], best['enhancement_rate'])
+        return (best['evaporation_rate']+0.1, best['enhancement_rate'] + 0.01)
+    solutions, index = performSweep(parameters, grid, processes=processes)
     print(index[0] / (resolution * 10), index[1] / resolution)
-    fig = plt.figure()
-    ax = fig.add_subplot(111, projection='3d')
-    ax.plot_trisurf(X, Y, Z, linewidth=0.2, antialiased=True)
-    plt.show()
+    # the solutions of the grid as a heatmap, written without any display
+    from render import renderHeatmap
+    renderHeatmap(solutions[..., 0], image, grid['evaporation_rate'], grid['enhancement_rate'],
+                  'evaporation_rate', 'enhancement_rate', 'solution')
     return (index[0] / (resolution * 10)+0.1, index[1] / resolution + 0.01)
 
 def performExperimentc(evap=0.01, enhancement=0.2):
-    parameters = {
-        'file_name': "example1.png",
-        'verbose': True,
-        'custom_graph': True,
-        'custom_weights': True,
-        'ant_number': 100,
-        'node_number': 9,
-        'steps': 100,
-        'src_nodes': [0],
-        'dst_nodes': [8],
-        'init_pheromon': 1,
-        'alpha': 1,
-        'beta': 1,
-        'gamma': 1,
-        'enhancement_rate': enhancement,
-        'evaporation_rate': evap ,
-
-        'edges': [(0, 1), (0, 2), (1, 3), (1, 4), (2, 4), (2, 5), (3, 6), (4, 6), (4, 7), (6, 8), (7, 8)],
-        'edges_to_reset': [],
-        'step_to_reset': -1,
-        'costs': {0: {0: 1, 1: 2, 2: 10, 3: 0, 4: 0, 5: 0, 6: 0, 7: 0, 8: 0},
-                  1: {0: 2, 1: 1, 2: 0, 3: 1, 4: 2, 5: 0, 6: 0, 7: 0, 8: 0},
-                  2: {0: 10, 1: 0, 2: 1, 3: 0, 4: 10, 5: 10, 6: 0, 7: 0, 8: 0},
-                  3: {0: 0, 1: 3, 2: 0, 3: 1, 4: 0, 5: 0, 6: 1, 7: 0, 8: 0},
-                  4: {0: 0, 1: 2, 2: 10, 3: 0, 4: 1, 5: 0, 6: 10, 7: 2, 8: 0},
-                  5: {0: 0, 1: 0, 2: 10, 3: 0, 4: 0, 5: 1, 6: 0, 7: 0, 8: 0},
-                  6: {0: 0, 1: 0, 2: 0, 3: 1, 4: 10, 5: 0, 6: 1, 7: 0, 8: 10},
-                  7: {0: 0, 1: 0, 2: 0, 3: 0, 4: 2, 5: 0, 6: 0, 7: 1, 8: 2},
-                  8: {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0, 6: 10, 7: 2, 8: 1}},
-
-        'max_vols': {0: {0: 1, 1: 2, 2: 10, 3: 0, 4: 0, 5: 0, 6: 0, 7: 0, 8: 0},
-                     1: {0: 2, 1: 1, 2: 0, 3: 1, 4: 2, 5: 0, 6: 0, 7: 0, 8: 0},
-                     2: {0: 10, 1: 0, 2: 1, 3: 0, 4: 10, 5: 10, 6: 0, 7: 0, 8: 0},
-                     3: {0: 0, 1: 3, 2: 0, 3: 1, 4: 0, 5: 0, 6: 1, 7: 0, 8: 0},
-                     4: {0: 0, 1: 2, 2: 10, 3: 0, 4: 1, 5: 0, 6: 10, 7: 2, 8: 0},
-                     5: {0: 0, 1: 0, 2: 10, 3: 0, 4: 0, 5: 1, 6: 0, 7: 0, 8: 0},
-                     6: {0: 0, 1: 0, 2: 0, 3: 1, 4: 10, 5: 0, 6: 1, 7: 0, 8: 10},
-                     7: {0: 0, 1: 0, 2: 0, 3: 0, 4: 2, 5: 0, 6: 0, 7: 1, 8: 2},
-                     8: {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0, 6: 10, 7: 2, 8: 1}}
-    }
+    parameters, _ = loadConfig(os.path.join(CONFIG_DIRECTORY, "experimentc.toml"))
+    parameters['enhancement_rate'] = enhancement
+    parameters['evaporation_rate'] = evap
 
     graph = Graph(parameters)
     graph.performSimulation()
     #graph.showStats()
     graph.showGraph()
 
-performExperimentc()
\ No newline at end of file
+if __name__ == '__main__':
+    performExperimentc()
@@ -0,0 +1,255 @@
+import numpy as np
+from collections import deque
+from colony import Colony
+from streamstats import TripStatistics
+
+class Flow(Colony):
+    """
+    Colony whose vehicles are not tracked one by one but counted per half-edge
+    and group, a group being all vehicles travelling from one node to another.
+    Each step the vehicles of a group on a half-edge are distributed over the
+    next half-edges with one multinomial draw using the pheromone^alpha rule
+    of Ant.findNext(). Only the occupied (group, half-edge) entries are kept,
+    so a step costs O(entries x max degree) however many vehicles there are,
+    and at most O(half-edges x groups). Vehicles arriving at their destination
+    join the group travelling back to their start node.
+
+    Attributes:
+        - src_node: start node of each group
+        - dst_node: destination node of each group
+        - partner: index of the group travelling in the opposite direction
+        - vehicles: number of vehicles travelling between the nodes of each group, in either direction
+        - at_node: number of vehicles of each group still at its start node
+        - entry_group, entry_edge: group and half-edge of each occupied entry,
+            sorted by group and then half-edge
+        - entry_count: number of vehicles of each entry
+        - entry_cost: mean cost of the current trip of the vehicles of each entry
+
+        - random: RandomStream whose generator draws the distribution of the vehicles
+        - heuristic: DistanceHeuristic weighting the routing decisions, None to route by pheromones only
+
+        *** statistical attributes ***
+        - cost_sum: mean cost of the current trip of the vehicles of each group
+        - passes: mean trip costs of each group, one entry per step in which vehicles
+            of the group reached their destination, at most history of them
+        - last_pass: mean cost of the trips of each group completed last, nan if there is none yet
+        - statistics: TripStatistics of these mean trip costs of each group
+        - history: number of trip costs kept in passes, all if None
+
+    Methods:
+        - reset(src_nodes, dst_nodes): puts all vehicles back to their start nodes
+        - solution() -> mean of the median trip costs of the groups, weighted by their vehicles
+        - onEdges(half_edge_number) -> number of vehicles on each half-edge
+        - setEntries(groups, half_edges, counts, costs, half_edge_number):
+            sets the entries to the given bunches of vehicles
+        - findNext(edges, parameters) -> groups, candidates, draws, costs:
+            distributes the vehicles of every group at every node over the next half-edges
+        - depositPheromones(edges, parameters, entering):
+            updates pheromones on all half-edges entered by vehicles
+        - move(edges, parameters):
+            moves all vehicles and updates appriopriately volumes and pheromones in edges
+    """
+    def __init__(self, src_nodes, dst_nodes, random, history=None):
+
+        self.random = random
+        self.history = history
+        self.heuristic = None
+        vehicles = np.stack([np.asarray(src_nodes, dtype=np.int64), np.asarray(dst_nodes, dtype=np.int64)], axis=1)
+        pairs = np.unique(np.concatenate([vehicles, vehicles[:, ::-1]]), axis=0)
+        self.src_node = pairs[:, 0].copy()
+        self.dst_node = pairs[:, 1].copy()
+
+        # groups are sorted by (src_node, dst_node), so they are found by their keys
+        base = int(pairs.max()) + 1 if len(pairs) else 1
+        keys = self.src_node * base + self.dst_node
+        self.partner = np.searchsorted(keys, self.dst_node * base + self.src_node)
+        self.at_node = np.bincount(np.searchsorted(keys, vehicles[:, 0] * base + vehicles[:, 1]),
+                                   minlength=len(pairs)).astype(np.int64)
+        # a group from a node to itself is its own partner
+        self.vehicles = self.at_node + np.where(self.partner != np.arange(len(pairs)), self.at_node[self.partner], 0)
+        self.entry_group = np.zeros(0, dtype=np.int64)
+        self.entry_edge = np.zeros(0, dtype=np.int64)
+        self.entry_count = np.zeros(0, dtype=np.int64)
+        self.entry_cost = np.zeros(0, dtype=np.float64)
+
+        self.cost_sum = np.zeros(len(pairs), dtype=np.float64)
+        self.passes = [deque(maxlen=history) for _ in range(len(pairs))]
+        self.last_pass = np.full(len(pairs), np.nan)
+        self.statistics = TripStatistics(len(pairs))
+
+    arrays = ('src_node', 'dst_node', 'partner', 'vehicles', 'at_node', 'entry_group', 'entry_edge',
+              'entry_count', 'entry_cost', 'cost_sum', 'last_pass')
+
+    def reset(self, src_nodes, dst_nodes):
+        heuristic = self.heuristic
+        self.__init__(src_nodes, dst_nodes, self.random, self.history)
+        self.heuristic = heuristic
+
+    def __len__(self):
+        return int(self.at_node.sum() + self.entry_count.sum())
+
+    def solution(self):
+        # every group counts with its vehicles, as each of them would as an ant
+        medians = self.statistics.medians
+        with_trips = ~np.isnan(medians)
+        if not with_trips.any():
+            return np.nan
+        return float(np.average(medians[with_trips], weights=self.vehicles[with_trips]))
+
+    def onEdges(self, half_edge_number):
+        return np.bincount(self.entry_edge, weights=self.entry_count, minlength=half_edge_number).astype(np.int64)
+
+    def setEntries(self, groups, half_edges, counts, costs, half_edge_number):
+        """
+        Sets the entries to the given vehicles, merging those of the same group
+        on the same half-edge and dropping empty ones
+
+        Arguments:
+            groups, half_edges: group and half-edge of each bunch of vehicles
+            counts: number of vehicles of each bunch
+            costs: sum of the trip costs of the vehicles of each bunch
+            half_edge_number: number of half-edges of the network
+        """
+        occupied = counts > 0
+        keys, inverse = np.unique(groups[occupied] * half_edge_number + half_edges[occupied], return_inverse=True)
+        counts = np.bincount(inverse, weights=counts[occupied], minlength=len(keys))
+        self.entry_group, self.entry_edge = np.divmod(keys, half_edge_number)
+        self.entry_count = counts.astype(np.int64)
+        self.entry_cost = np.bincount(inverse, weights=costs[occupied], minlength=len(keys)) / np.maximum(counts, 1)
+
+    def findNext(self, edges, parameters):
+        """
+        Distributes the vehicles of every entry, and those still at their start
+        node, over the next half-edges with probability proportional to
+        pheromone^alpha, without going back the half-edge they came along
+        unless it is a dead end or they are at their destination
+
+        Arguments:
+            edges: EdgeStore with all data about nodes & edges
+            parameters: dict of all steering parameters
+
+        Return:
+            groups: group of each distributed bunch of vehicles
+            candidates: (bunches x max degree) table of the next half-edges of each bunch
+            draws: number of vehicles of each bunch taking each candidate
+            costs: mean cost of the current trip of the vehicles of each bunch
+        """
+        waiting = np.flatnonzero(self.at_node)
+        counts = np.concatenate([self.entry_count, self.at_node[waiting]])
+        costs = np.concatenate([self.entry_cost, np.zeros(len(waiting))])
+        nodes = np.concatenate([edges.neighbors[self.entry_edge], self.src_node[waiting]])
+        groups = np.concatenate([self.entry_group, waiting])
+        incoming = np.concatenate([self.entry_edge, np.full(len(waiting), -1, dtype=np.int64)])
+
+        # weight of every half-edge, computed once for all groups
+        weights = edges.raw_pheromones[edges.edge_ids] ** parameters['alpha']
+
+        # gather the candidates of each bunch into a padded (bunches x max degree) table
+        lo = edges.offsets[nodes]
+        degree = edges.offsets[nodes + 1] - lo
+        columns = np.arange(degree.max() if len(degree) else 0)
+        valid = columns < degree[:, None]
+        candidates = np.where(valid, lo[:, None] + columns, lo[:, None])
+        # closed half-edges have no weight, even with alpha 0
+        probs = np.where(valid & ~edges.closed[candidates], weights[candidates], 0.0)
+        if self.heuristic is not None:
+            probs *= self.heuristic.factors(edges, candidates, self.dst_node[groups], parameters)
+
+        # vehicles do not go back the half-edge they came along
+        no_backtrack = (incoming >= 0) & (nodes != self.dst_node[groups]) & (degree > 1)
+        probs[no_backtrack[:, None] & (candidates == edges.reverse[incoming][:, None])] = 0
+
+        # if there is only one possible candidate, take it unless it is closed
+        probs[(degree == 1) & ~edges.closed[lo], 0] = 1
+
+        # without any weight left, e.g. with all other candidates closed, see EdgeStore.fallbackChoice()
+        total = probs.sum(axis=1)
+        stuck = np.flatnonzero(total == 0)
+        if len(stuck):
+            back = np.where(incoming[stuck] >= 0, edges.reverse[incoming[stuck]], -1)
+            probs[stuck, edges.fallbackChoice(candidates[stuck], valid[stuck], back)] = 1
+            total[stuck] = 1
+
+        draws = self.random.generator.multinomial(counts, probs / total[:, None])
+        return groups, candidates, draws, costs
+
+    def depositPheromones(self, edges, parameters, entering):
+        """
+        Deposits pheromones with the rule of Ant.depositPheromones(), summed up over
+        all vehicles entering an edge as if they moved one after another in random
+        order: a vehicle finds on the edge those which entered it before, in either
+        direction, and its share of those which have not left it yet
+
+        Arguments:
+            edges: EdgeStore with all data about nodes & edges
+            parameters: dict of all steering parameters
+            entering: number of vehicles entering each half-edge
+        """
+        total = entering + entering[edges.reverse]
+        leaving = edges.cur_vol[edges.edge_ids]
+        max_vol = edges.max_vol
+        neighbors = edges.offsets[edges.neighbors + 1] - edges.offsets[edges.neighbors]
+
+        # the j-th vehicle entering an edge finds a + b*j vehicles on it, it deposits
+        # as long as this volume does not exceed the capacity, so over an interval of j
+        a = leaving * total / (total + 1)
+        b = 1 - leaving / (total + 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bound = (max_vol - a) / b
+        first = np.where(b < 0, np.maximum(np.ceil(bound), 0), 0)
+        last = np.where(b > 0, np.minimum(np.floor(bound), total - 1), total - 1)
+        last = np.where((b == 0) & (a > max_vol), -1, last)
+        depositing = np.maximum(last - first + 1, 0)
+
+        # each direction gets its share of the deposits of all entering vehicles
+        capacity = depositing * (max_vol - a) - b * (first + last) * depositing / 2
+        capacity = np.divide(capacity * entering, total, out=np.zeros(len(total)), where=total > 0)
+
+        # deposite pheromones only if there is capacity available on the edge and it is not a dead end
+        deposit = (depositing > 0) & (entering > 0) & (neighbors > 1)
+        cost = edges.costs + 1
+        growth = (edges.raw_pheromones[edges.edge_ids]/cost)*(capacity/(max_vol+1))*parameters["enhancement_rate"]
+        edges.raw_pheromones += np.bincount(edges.edge_ids[deposit], weights=growth[deposit], minlength=len(edges.raw_pheromones))
+        edges.invalidateWeights()
+
+    def move(self, edges, parameters):
+        """
+        Executes one move of every vehicle and updates volumes and pheromones in edges
+
+        Arguments:
+            edges: EdgeStore with all data about nodes & edges
+            parameters: dict of all steering parameters
+        """
+        groups, candidates, draws, costs = self.findNext(edges, parameters)
+        half_edge_number = len(edges.neighbors)
+
+        # collect the vehicles on the half-edges they entered
+        entering = np.bincount(candidates.ravel(), weights=draws.ravel(), minlength=half_edge_number)
+        self.setEntries(np.repeat(groups, candidates.shape[1]), candidates.ravel(), draws.ravel(),
+                        (draws * (costs[:, None] + edges.costs[candidates])).ravel(), half_edge_number)
+        self.at_node[:] = 0
+
+        # update pheromones on the entered edges, then all vehicles have left their previous edges
+        self.depositPheromones(edges, parameters, entering)
+        edges.cur_vol[:] = np.bincount(edges.edge_ids, weights=entering, minlength=len(edges.cur_vol))
+
+        # vehicles at their destination record the mean cost of their trips
+        arrived = edges.neighbors[self.entry_edge] == self.dst_node[self.entry_group]
+        arrivals = np.bincount(self.entry_group[arrived], weights=self.entry_count[arrived], minlength=len(self.src_node))
+        trip_sums = np.bincount(self.entry_group[arrived], weights=(self.entry_count * self.entry_cost)[arrived],
+                                minlength=len(self.src_node))
+        groups = np.flatnonzero(arrivals)
+        trip_costs = trip_sums[groups] / arrivals[groups]
+        for g, trip_cost in zip(groups, trip_costs.tolist()):
+            self.passes[g].append(trip_cost)
+        self.statistics.update(groups, trip_costs)
+        self.last_pass[groups] = trip_costs
+
+        # and turn back as vehicles of the partner group on a new trip
+        entry_group = np.where(arrived, self.partner[self.entry_group], self.entry_group)
+        entry_cost = np.where(arrived, 0.0, self.entry_cost)
+        self.setEntries(entry_group, self.entry_edge, self.entry_count, self.entry_count * entry_cost, half_edge_number)
+
+        vehicles = np.bincount(self.entry_group, weights=self.entry_count, minlength=len(self.src_node))
+        cost = np.bincount(self.entry_group, weights=self.entry_count * self.entry_cost, minlength=len(self.src_node))
+        self.cost_sum = np.divide(cost, vehicles, out=np.zeros(len(vehicles)), where=vehicles > 0)
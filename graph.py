@@ -1,17 +1,27 @@
-import networkx as nx
 from math import ceil
-import matplotlib.pyplot as plt
 from ant import Ant
+from colony import Colony
+from flow import Flow
+from edgestore import EdgeStore
+from randomstream import RandomStream
+from loaders import fromTuples, readNetwork
+from recorder import PrintRecorder
+from convergence import ConvergenceMonitor
+from events import EventQueue, applyEvent
+from heuristic import DistanceHeuristic
 import numpy as np
+import json
+import os
+import shutil
+from contextlib import nullcontext
+from statistics import NormalDist
+
+# networkx and matplotlib are imported by the methods needing them only,
+# so batch runs and the workers of sweeps start without loading them
 
 """[IN PROGRESS]"""
 """
-[TODO] ceate and print heatmaps, first think how to perform many simulations, maybe extract this functionality 
-       somewhere else
-       
-[TODO]     
-
-[TODO] save data as csv, save graph as png
+[TODO] save data as csv
 """
 
 class Graph:
@@ -19,32 +29,73 @@ class Graph:
     Class realizing ACO algorithm on the graph
     
     Attributes:
-        - ants: ant colony as a list of Ant objects
-        - graph_data: all data about nodes & edges as a dict
-        - graph: graph structure as networx graph
+        - random: RandomStream of the simulation, seeded with seed from parameters
+        - colony: state of all ants as a Colony, or as a Flow counting
+          vehicles per half-edge if aggregate is set in parameters
+        - ants: ant colony as a list of Ant objects, views on the colony,
+          empty in aggregate mode
+        - heuristic: DistanceHeuristic weighting the routing decisions of the colony
+          by the distances to the destinations if heuristic is set in parameters, None otherwise
+        - edges: all data about nodes & edges as an EdgeStore
+          With replicas set in parameters, edges holds that many disjoint copies
+          of the network and the colony has ant_number ants on each, all of them
+          moved in one pass per step (see EdgeStore.replicate())
+        - graph_data: read only view of edges in the former dict layout
+        - graph: graph structure as networx graph, its node attributes are
+          synchronised with edges only on demand by toNetworkx(); None until
+          then if the network was given as a sparse edge list
+        - graph_dirty: whether edges changed since the last synchronisation of graph
+        - step: number of steps performed so far
+        - converged_step: step at which the last performSimulation() converged,
+          None if it did not or convergence_tolerance is not set in parameters
+        - events: EventQueue of the scenario events not applied yet
+        - recorders: list of Recorder objects taking snapshots after each step
+        - profiler: Profiler of the last performSimulation() with profile set in parameters, None otherwise
         - parameters: setup variables customizing input model
           and manipulating the behavior of the algorithm
         
     Methods:
-        - evaporatePheromones(): performs global update on pheromone levels
-             Is influenced by evaporation_rate included in parameters
-        - performStep(): moves each ant, updates the values on the graph
+        - reset(parameters_overrides): restores the initial state of edges and ants
+             in place, optionally with some parameters changed
+        - scheduleEvents(): fills events with the events given in parameters
+             which are not due yet
+        - updateAnts(): renews the list of ants after ants were added or removed
+        - checkParameters(parameters): raises a ValueError for inconsistent parameters
+        - setHeuristic(): creates the heuristic if heuristic is set in parameters
+        - evaporatePheromones(moves): performs global update on pheromone levels
+             Is influenced by evaporation_rate and evaporation_mode included in parameters
+        - performStep(): applies the events due, moves each ant, updates the values on the graph
              and subsequently updates pheromone levels calling evaporatePheromones()
+             With batched set in parameters the whole colony is moved in one vectorized pass,
+             with aggregate set the counted vehicles are moved in one pass
         - performSimulation(): performs full Simulation with parameters 
-             given by initialization. After simulating given number of steps
+             given by initialization, stopping early once it converged if
+             convergence_tolerance is set. After simulating given number of steps
              prints the graph and optionally short summary/current state of the graph
+        - addRecorder(recorder): attaches a Recorder capturing the state after each step
+        - saveCheckpoint(path): writes the full state of the simulation to the directory path
+        - fromCheckpoint(path) -> Graph: restores a simulation written by saveCheckpoint()
+        - toNetworkx(): returns the networkx graph after synchronising its node
+             attributes with the current state of edges, if anything changed
         - showState():
              prints the current state of the graph: all edges inclusive their
              pheromone levels, costs, current and maximum capacities.
-        - showGraph():
-             prints the graph with edge widths dependent on pheromone level
-             and brightnesses of red dependent on maximal capacities
-        - showStats(): prints adges with their pheromone level in descending order,
+        - showGraph(file_name):
+             draws the graph with edge widths dependent on pheromone level
+             and brightnesses of red dependent on costs, saved as png to
+             img/file_name if a file name is given, shown otherwise
+        - topEdges(k) -> the k edges with the highest pheromone levels
+        With replicas, the networkx graph, the shown state and graph, and the top
+        edges are those of the original network with the state averaged over the replicas
+        - showStats(top): prints the top adges with their pheromone level in descending order,
             as well as basic stats such like avg/max/min/sum of number of passes and cost
+        - getSolution() -> mean over the ants of their median trip cost, in aggregate
+          mode over the groups of vehicles weighted by their number of vehicles
+        - getSolutions() -> solution of each replica
+        - getSolutionStats(confidence) -> mean, confidence interval and quantiles
+            of the solutions of the replicas
         
     """
-    ants = []
-
     def __init__(self, parameters):
         """
         Initialize a graph with setup parameters:
@@ -59,77 +110,242 @@ class Graph:
               and manipulating the behavior of the algorithm
            
         """
-        def getGraphData():
-            return { 'pheromones': {},'costs': {},'cur_vol' : {},'max_vol' : {} }
-
         #set up parameters and graph environment 
+        self.checkParameters(parameters)
         self.parameters = parameters
+        self.initial_parameters = dict(parameters)
+        
+        # a prebuilt network is memory-mapped, only the state of the run is allocated
+        if 'network_path' in self.parameters:
+            self.graph = None
+            self.edges = EdgeStore.loadNetwork(self.parameters['network_path'], self.parameters['init_pheromon'])
+
+        # a sparse network read from a file or given as a list of edges with their
+        # costs and maximum volumes is built directly, without a networkx graph
+        elif 'network_file' in self.parameters or self.isSparse():
+            if 'network_file' in self.parameters:
+                network = readNetwork(self.parameters['network_file'])
+            else:
+                network = fromTuples(self.parameters['edges'], self.parameters.get('node_number'))
+            self.graph = None
+            self.edges = EdgeStore.fromEdgeList(**network, init_pheromon=self.parameters['init_pheromon'])
         
         # create a predefined ladder graph  or a custom graph  with given edges
-        if not self.parameters['custom_graph']:
-            self.graph = nx.circular_ladder_graph( ceil(self.parameters['node_number']/2))
         else:
-            self.graph = nx.Graph()
-            self.graph.add_nodes_from([i for i in range(self.parameters['node_number'])])
-            self.graph.add_edges_from(parameters['edges'])
+            import networkx as nx
+            if not self.parameters['custom_graph']:
+                self.graph = nx.circular_ladder_graph( ceil(self.parameters['node_number']/2))
+            else:
+                self.graph = nx.Graph()
+                self.graph.add_nodes_from([i for i in range(self.parameters['node_number'])])
+                self.graph.add_edges_from(parameters['edges'])
+            
+            #self.graph.remove_edges_from(parameters['edges_to_remove'])
             
-        #self.graph.remove_edges_from(parameters['edges_to_remove'])
+            # assign pheromones, costs, current and maximum capacities to each edge 
+            # values are predefined or given i parameters
+            self.edges = EdgeStore.fromNetworkx(self.graph, self.parameters)
+        
+        # independent replicas of the simulation run on disjoint copies of the network,
+        # their networkx graph is built from edges when needed
+        if self.parameters.get('replicas', 1) > 1:
+            self.edges = self.edges.replicate(self.parameters['replicas'])
+            self.graph = None
         
         # assign source and destination nodes to each ant
+        self.random = RandomStream(self.parameters.get('seed'))
+        if self.parameters.get('aggregate', False):
+            self.colony = Flow(*self.assignNodes(), self.random, self.parameters.get('passes_history', 100))
+            self.ants = []
+        else:
+            self.colony = Colony(*self.assignNodes(), self.random, self.parameters.get('passes_history', 100))
+            self.ants = [Ant(self.colony, k) for k in range(len(self.colony))]
+        self.setHeuristic()
+        
+        # the networkx graph structure is filled with the data stored in edges only when needed
+        self.graph_dirty = True
+        
+        self.step = 0
+        self.converged_step = None
+        self.recorders = []
+        self.profiler = None
+        self.scheduleEvents()
+
+    def checkParameters(self, parameters):
+        """
+        Raises a ValueError if parameters need each other and one of them is missing
+        """
+        if parameters.get('checkpoint_interval', 0) and not parameters.get('checkpoint_path'):
+            raise ValueError("checkpoint_interval needs a checkpoint_path to write the checkpoints to")
+
+    def setHeuristic(self):
+        """
+        Creates the heuristic of the colony if heuristic is set in parameters,
+        the distances to the destinations of the ants are computed right away
+        """
+        if self.parameters.get('heuristic', False):
+            self.heuristic = DistanceHeuristic(self.edges, self.colony.dst_node)
+        else:
+            self.heuristic = None
+        self.colony.heuristic = self.heuristic
+
+    def isSparse(self):
+        """
+        Returns whether any of the edges in parameters carries its own costs and maximum volumes
+        """
+        edges = self.parameters.get('edges')
+        return bool(self.parameters['custom_graph'] and edges and any(len(edge) > 2 for edge in edges))
+
+    def assignNodes(self):
+        """
+        Distributes src_nodes and dst_nodes given in parameters among the ants
+        
+        Return:
+            src_nodes, dst_nodes: lists with the source and destination node of each ant
+        """
+        src_nodes, dst_nodes = [], []
         for k in range(self.parameters['ant_number']):
             src_index = k%min(len(self.parameters['src_nodes']),self.parameters['ant_number']) if k>0 else 0
             dst_index = k%min(len(self.parameters['dst_nodes']),self.parameters['ant_number']) if k>0 else 0
-            src_node = self.parameters['src_nodes'][src_index]
-            dst_node = self.parameters['dst_nodes'][dst_index]
-            self.ants.append(Ant(src_node, dst_node, k))
-        
-        self.graph_data = {k: getGraphData() for k in range(0, len(self.graph.nodes))}
-        
-        # assign pheromones, costs, current and maximum capacities to each edge 
-        # values are predefined or given i parameters
-        for node in self.graph.nodes:
-            for edge in self.graph.neighbors(node):
-                self.graph_data[node]['pheromones'][edge] = self.parameters['init_pheromon']
-                if not self.parameters['custom_weights']:
-                    self.graph_data[node]['costs'][edge] = 1
-                    self.graph_data[node]['cur_vol'][edge] = 0
-                    self.graph_data[node]['max_vol'][edge] = 1
-                else: 
-                    self.graph_data[node]['costs'][edge] = parameters['costs'][node][edge]
-                    self.graph_data[node]['cur_vol'][edge] = 0
-                    self.graph_data[node]['max_vol'][edge] = parameters['max_vols'][node][edge]
-        
-        # fill the networkx graph structure with the data stored in graph_data            
-        nx.set_node_attributes(self.graph, self.graph_data)
-
-    def evaporatePheromones(self):
+            src_nodes.append(self.parameters['src_nodes'][src_index])
+            dst_nodes.append(self.parameters['dst_nodes'][dst_index])
+        # every replica has its own ants on its copy of the network
+        if self.edges.replicas > 1:
+            src_nodes = np.concatenate([self.edges.replicaNodes(node) for node in src_nodes]).reshape(-1, self.edges.replicas).T.ravel()
+            dst_nodes = np.concatenate([self.edges.replicaNodes(node) for node in dst_nodes]).reshape(-1, self.edges.replicas).T.ravel()
+        return src_nodes, dst_nodes
+
+    def reset(self, parameters_overrides=None):
         """
-        Decreases pheromone level on each edge by a factor given in parameters
+        Restores initial pheromone levels, empty edges, ants at their start nodes
+        and empty statistics without rebuilding the network, so that the same
+        Graph can be used for many runs
+        
+        Arguments:
+            parameters_overrides: dict of parameters to change with respect to the
+              parameters the graph was created with; parameters describing the
+              network itself can not be changed
+        """
+        parameters_overrides = parameters_overrides or {}
+        for key in ('custom_graph', 'custom_weights', 'node_number', 'edges', 'costs', 'max_vols', 'network_file', 'network_path', 'aggregate', 'replicas'):
+            if key in parameters_overrides and parameters_overrides[key] != self.initial_parameters.get(key):
+                raise ValueError("changing '"+key+"' requires a new Graph")
+        
+        self.checkParameters(dict(self.initial_parameters, **parameters_overrides))
+        self.parameters = dict(self.initial_parameters, **parameters_overrides)
+        self.edges.reset(self.parameters['init_pheromon'])
+        self.random = RandomStream(self.parameters.get('seed'))
+        self.colony.random = self.random
+        self.colony.reset(*self.assignNodes())
+        if not self.parameters.get('aggregate', False) and len(self.ants) != len(self.colony):
+            self.ants = [Ant(self.colony, k) for k in range(len(self.colony))]
+        # the cached distances are kept unless events changed the network
+        if self.parameters.get('heuristic', False) and self.heuristic is not None:
+            self.heuristic.reset()
+            self.colony.heuristic = self.heuristic
+        else:
+            self.setHeuristic()
+        self.graph_dirty = True
+        self.step = 0
+        self.converged_step = None
+        self.scheduleEvents()
+
+    def scheduleEvents(self):
         """
-        for u in self.graph.nodes:
-            for v in self.graph.neighbors(u):
-                if self.graph_data[u]['pheromones'][v] > 0 :
-                    self.graph_data[u]['pheromones'][v] -= self.parameters['evaporation_rate'] * self.graph_data[u]['pheromones'][v]
-                    self.graph_data[v]['pheromones'][u] -= self.parameters['evaporation_rate'] * self.graph_data[v]['pheromones'][u]
+        Fills events with the events given in parameters which are due at the
+        current step or later. A step_to_reset (counted in remaining steps)
+        with its edges_to_reset is scheduled as a reset_pheromones event
+        """
+        total_steps = self.step + self.parameters['steps']
+        events = list(self.parameters.get('events', []))
+        if 0 <= total_steps - self.parameters.get('step_to_reset', -1) < total_steps:
+            events.append({'step': total_steps - self.parameters['step_to_reset'], 'type': 'reset_pheromones',
+                           'edges': self.parameters['edges_to_reset']})
+        self.events = EventQueue(event for event in events if event['step'] >= self.step)
 
+    def updateAnts(self):
+        """
+        Renews ants and ant_number in parameters after ants were added to or removed from the colony
+        """
+        self.ants = [Ant(self.colony, k) for k in range(len(self.colony))]
+        self.parameters['ant_number'] = len(self.colony) // self.edges.replicas
+
+    @property
+    def graph_data(self):
+        return self.edges.asDict()
+
+    def evaporatePheromones(self, moves=1):
+        """
+        Decreases pheromone level on each edge by a factor given in parameters
+        With evaporation_mode 'move' it is called after every ant move and decays
+        each edge twice per move, once from both of its endpoints, as before.
+        With evaporation_mode 'step' it is called once per step and decays each edge once
+        
+        Arguments:
+            moves: number of ant moves to evaporate for at once
+        """
+        if self.parameters.get('evaporation_mode', 'move') == 'move':
+            self.edges.evaporate(self.parameters['evaporation_rate'], 2*moves)
+        else:
+            self.edges.evaporate(self.parameters['evaporation_rate'])
 
     def performStep(self):
         """
-        Moves each ant, updates both graph_data and the networkx graph
+        Moves each ant and updates edges
         Finally decrements the number of steps left
         """
-        for ant in self.ants:
-            if self.parameters['steps'] == self.parameters['step_to_reset']:
-                for u,v in self.parameters['edges_to_reset']:
-                    self.graph_data[u]['pheromones'][v] = 0.0000001
-                    self.graph_data[v]['pheromones'][u] = 0.0000001
-            nx.set_node_attributes(self.graph, ant.move(self.graph_data, self.parameters))
+        evaporate_per_move = self.parameters.get('evaporation_mode', 'move') == 'move'
+        
+        # scenario events are applied once before the ants move
+        for event in self.events.due(self.step):
+            applyEvent(self, event)
+            self.graph_dirty = True
+        
+        # replicas are always moved in one pass
+        if self.parameters.get('batched', False) or self.parameters.get('aggregate', False) or self.edges.replicas > 1:
+            self.colony.move(self.edges, self.parameters)
+            # evaporate as often as the ant by ant loop does, in each replica
+            if evaporate_per_move:
+                self.evaporatePheromones(len(self.colony) // self.edges.replicas)
+        else:
+            for ant in self.ants:
+                ant.move(self.edges, self.parameters)
+                if evaporate_per_move:
+                    self.evaporatePheromones()
+        
+        if not evaporate_per_move:
             self.evaporatePheromones()
+        self.graph_dirty = True
+        self.step += 1
         self.parameters['steps'] -= 1
 
+    def toNetworkx(self):
+        """
+        Returns the networkx graph with the current state of edges as node attributes
+        in the graph_data layout. The attributes are rewritten only if the state
+        changed since the last call. With replicas the graph is the original
+        network with the state averaged over the replicas
+        """
+        import networkx as nx
+        edges = self.edges.replicaMean()
+        if self.graph is None:
+            # build the graph of a sparse network from edges on first use
+            node_number = len(edges.offsets)-1
+            sources = np.repeat(np.arange(node_number), np.diff(edges.offsets))
+            forward = sources < edges.neighbors
+            self.graph = nx.Graph()
+            self.graph.add_nodes_from(range(node_number))
+            self.graph.add_edges_from(zip(sources[forward].tolist(), edges.neighbors[forward].tolist()))
+        if self.graph_dirty:
+            nx.set_node_attributes(self.graph, edges.toDict())
+            self.graph_dirty = False
+        return self.graph
+
     def performSimulation(self):
         """
-        Performs given number of steps.
+        Performs given number of steps, or less if convergence_tolerance is set in
+        parameters and the run converges earlier, see ConvergenceMonitor
+        With profile set in parameters the phases of the steps are timed by a Profiler
         Subsequently prints the resulting graph and/or statistics, graph_data
         """
         
@@ -139,12 +355,48 @@ class Graph:
             self.showState()
             print("=====================")
 
-        while self.parameters['steps'] > 0:
-            if self.parameters['verbose']: print("Performing step")
-            self.performStep()
-            if self.parameters['verbose']: self.showState()
+        # printing the state after each step is just one more recorder
+        recorders = self.recorders + [PrintRecorder()] if self.parameters['verbose'] else self.recorders
+
+        # optionally save a checkpoint every checkpoint_interval steps
+        checkpoint_interval = self.parameters.get('checkpoint_interval', 0)
+
+        # optionally stop as soon as pheromones and trip costs do not change anymore
+        monitor = None
+        if self.parameters.get('convergence_tolerance'):
+            monitor = ConvergenceMonitor(self.parameters['convergence_tolerance'],
+                                         self.parameters.get('convergence_window', 10),
+                                         self.parameters.get('convergence_patience', 10),
+                                         self.parameters.get('convergence_norm', 'l1'))
+            recorders = recorders + [monitor]
+
+        # optionally time the phases of the steps, imported only when needed
+        # since the profiler wraps methods of Graph
+        profiler = nullcontext()
+        if self.parameters.get('profile', False):
+            from profiler import Profiler
+            profiler = self.profiler = Profiler(self.parameters.get('profile_steps'))
+
+        with profiler:
+            while self.parameters['steps'] > 0:
+                self.performStep()
+                for recorder in recorders:
+                    recorder.record(self)
+                if checkpoint_interval and self.step % checkpoint_interval == 0:
+                    self.saveCheckpoint(self.parameters['checkpoint_path'])
+                if monitor and monitor.converged():
+                    self.converged_step = monitor.converged_step
+                    break
+        for recorder in recorders:
+            recorder.flush()
+        if self.profiler is not None and self.parameters.get('profile_output'):
+            self.profiler.save(self.parameters['profile_output'])
 
         if self.parameters['verbose']:
+            if self.converged_step is not None:
+                print("Converged after step", self.converged_step)
+            if self.profiler is not None:
+                print("Profile:", self.profiler.summary())
             print("=====================\nFinished Simulation\n\nResult graph:")
             self.showState()
         #self.showGraph(self.parameters['file_name'])
@@ -152,99 +404,216 @@ class Graph:
         #self.showStats()
         
     
+    def addRecorder(self, recorder):
+        """
+        Attaches a Recorder which is called after every step of performSimulation()
+        """
+        self.recorders.append(recorder)
+
+    def saveCheckpoint(self, path):
+        """
+        Writes the full state of the simulation to the directory path: the arrays
+        of edges and of the colony as .npy files, the random stream, the step and
+        the parameters (with the remaining steps) as state.json. The directory is
+        replaced only once the new checkpoint is complete, so a crash while
+        writing leaves the previous checkpoint intact. Recorders are not saved
+        
+        Arguments:
+            path: directory to write the checkpoint to
+        """
+        tmp_path = path.rstrip(os.sep) + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        # a memory-mapped network is not copied, only the state of its edges
+        self.edges.save(os.path.join(tmp_path, "edges"), network='network_path' not in self.parameters or self.edges.replicas > 1)
+        self.colony.save(os.path.join(tmp_path, "colony"))
+        if self.heuristic is not None:
+            np.save(os.path.join(tmp_path, "heuristic_blocked.npy"), self.heuristic.blocked)
+        np.save(os.path.join(tmp_path, "random_block.npy"), self.random.block)
+        
+        # the network itself is stored in edges, dense cost tables are not needed anymore
+        network_keys = ('edges', 'costs', 'max_vols')
+        state = {'step': self.step,
+                 'parameters': {k: v for k, v in self.parameters.items() if k not in network_keys},
+                 'initial_parameters': {k: v for k, v in self.initial_parameters.items() if k not in network_keys},
+                 'random': {'state': self.random.generator.bit_generator.state,
+                            'position': self.random.position,
+                            'block_size': self.random.block_size}}
+        with open(os.path.join(tmp_path, "state.json"), 'w') as f:
+            json.dump(state, f)
+        
+        old_path = path.rstrip(os.sep) + ".old"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def fromCheckpoint(cls, path, mmap_mode='c'):
+        """
+        Restores a simulation written by saveCheckpoint(), performSimulation()
+        continues it with the remaining steps exactly as the saved run would have
+        
+        Arguments:
+            path: directory the checkpoint was written to
+            mmap_mode: mode in which the arrays of edges are memory-mapped,
+              the default copy-on-write mode never changes the checkpoint,
+              None reads them into memory
+        
+        Return:
+            Graph in the saved state
+        """
+        with open(os.path.join(path, "state.json")) as f:
+            state = json.load(f)
+        
+        graph = cls.__new__(cls)
+        graph.parameters = state['parameters']
+        graph.initial_parameters = state['initial_parameters']
+        graph.edges = EdgeStore.load(os.path.join(path, "edges"), mmap_mode, graph.parameters.get('network_path'))
+        graph.graph = None
+        
+        graph.random = RandomStream(block_size=state['random']['block_size'])
+        graph.random.generator.bit_generator.state = state['random']['state']
+        graph.random.block = np.load(os.path.join(path, "random_block.npy"))
+        graph.random.position = state['random']['position']
+        if graph.parameters.get('aggregate', False):
+            graph.colony = Flow.load(os.path.join(path, "colony"), graph.random, graph.parameters.get('passes_history', 100))
+            graph.ants = []
+        else:
+            graph.colony = Colony.load(os.path.join(path, "colony"), graph.random, graph.parameters.get('passes_history', 100))
+            graph.ants = [Ant(graph.colony, k) for k in range(len(graph.colony))]
+        graph.heuristic = None
+        if graph.parameters.get('heuristic', False):
+            # the edges closed by events are restored, the distances are computed on first use;
+            # events may have changed the network, so reset() has to compute them again
+            graph.heuristic = DistanceHeuristic(graph.edges)
+            graph.heuristic.blocked[:] = np.load(os.path.join(path, "heuristic_blocked.npy"))
+            graph.heuristic.changed = True
+        graph.colony.heuristic = graph.heuristic
+        
+        graph.graph_dirty = True
+        graph.step = state['step']
+        graph.converged_step = None
+        graph.recorders = []
+        graph.profiler = None
+        graph.scheduleEvents()
+        return graph
+
     def showState(self):
         print("[graph]: current state of the graph...........................")
-        for node in self.graph.nodes:
-            for edge in self.graph.neighbors(node):
+        # replicas are shown as the original network with their mean state
+        edges = self.edges.replicaMean()
+        if self.edges.replicas > 1:
+            print("    mean over", self.edges.replicas, "replicas")
+        for node in range(len(edges.offsets)-1):
+            for i in range(edges.offsets[node], edges.offsets[node+1]):
+                edge = edges.neighbors[i]
                 # print only one direction on each edge, since its undirected graph
                 if node < edge:
-                    phe = self.graph_data[node]['pheromones'][edge]
-                    cost = self.graph_data[node]['costs'][edge]
-                    cur = self.graph_data[node]['cur_vol'][edge]
-                    max = self.graph_data[node]['max_vol'][edge]
+                    phe = edges.pheromones[edges.edge_ids[i]]
+                    cost = edges.costs[i]
+                    cur = edges.cur_vol[edges.edge_ids[i]]
+                    max = edges.max_vol[i]
                     print("    edge (",node,",",edge,") phe: ",phe," cost: ",cost," curvol: ",cur," maxvol: ",max)
 
     
-    def showStats(self):
+    def topEdges(self, k=10):
         """
-        
+        Returns the k edges with the highest pheromone levels in descending order
+        as a list of (from, to, pheromone level) tuples, in O(edges + k log k)
+        With replicas the edges of the original network with their pheromone
+        levels averaged over the replicas
+        """
+        edges = self.edges.replicaMean()
+        pheromones = edges.pheromones
+        k = min(k, len(pheromones))
+        top = np.argpartition(-pheromones, k-1)[:k] if k > 0 else np.zeros(0, dtype=np.int64)
+        top = top[np.argsort(-pheromones[top], kind='stable')]
+        sources, targets = edges.endpoints()
+        return [(int(sources[e]), int(targets[e]), pheromones[e].item()) for e in top]
+
+    def showStats(self, top=None):
+        """
+        Prints the top edges with their pheromone levels in descending order,
+        all of them if top is None, and statistics of the trip costs of the ants
         """
-        print("[graph]: statistics..............................[IN PROGRESS]")
+        print("[graph]: statistics...........................................")
         
-        # sort edges accoridng to thier pheromone levels and print them in descending order
-        r,t = [],[]
-        for node in self.graph.nodes:
-            for edge in self.graph.neighbors(node):
-                if node < edge:
-                    r.append({'from':node,'to':edge,'phe':self.graph_data[node]['pheromones'][edge]})
-        
-        for k in range(len(self.graph.edges())):
-            max_index, max_elem = 0, r[0]
-            for i in range(len(r)):
-                if( r[i]['phe'] > max_elem['phe']): 
-                    max_elem = r[i]
-                    max_index = i
-            t.append(max_elem)
-            del(r[max_index])
-            
-        # print basic descriptive statistics
-        for i in range(len(t)):
-            print("    edge (",t[i]['from'],",",t[i]['to'],") phe: ",t[i]['phe'])
+        # print edges according to their pheromone levels in descending order
+        for u, v, phe in self.topEdges(len(self.edges.raw_pheromones) // self.edges.replicas if top is None else top):
+            print("    edge (",u,",",v,") phe: ",phe)
         print()
+        
+        # print basic descriptive statistics
+        import matplotlib.pyplot as plt
+        statistics = self.colony.statistics
         for ant in self.ants:
             print("    ant nr: ",ant.number," src: ",ant.src_node," dst: ",ant.dst_node," cost: ",ant.cost_sum)
             plt.subplot(int(np.sqrt(len(self.ants))), int(len(self.ants)/np.sqrt(len(self.ants)))+1,ant.number+1)
             plt.plot(range(len(ant.passes)), ant.passes)
-        all_costs = [ np.mean(ant.passes) if len(ant.passes)>0 else 1 for ant in self.ants]
         plt.show()
         print()
-        print("    sum: ",sum(all_costs)," avg: ",np.mean(all_costs)," min: ",min(all_costs)," max: ",max(all_costs))
+        all_costs = np.where(statistics.ants.count > 0, statistics.ants.mean, 1)
+        print("    sum: ",all_costs.sum()," avg: ",np.mean(all_costs)," min: ",all_costs.min()," max: ",all_costs.max())
+        print("    trips: ",statistics.colony.count[0]," mean cost: ",statistics.colony.mean[0],
+              " std: ",np.sqrt(statistics.colony.variance()[0])," median: ",statistics.colony_median.quantile()[0])
 
     def getSolution(self):
-        return np.mean([ np.median(ant.passes) for ant in self.ants if len(ant.passes) > 0])
+        return self.colony.solution()
+
+    def getSolutions(self):
+        """
+        Returns the solution of each replica: the mean over its ants of their median trip cost,
+        in aggregate mode each group of vehicles counts with its number of vehicles
+        """
+        statistics = self.colony.statistics
+        with_trips = ~np.isnan(statistics.medians)
+        replica = self.edges.replica(self.colony.src_node[with_trips])
+        weights = np.ones(np.count_nonzero(with_trips))
+        if self.parameters.get('aggregate', False):
+            weights = self.colony.vehicles[with_trips]
+        sums = np.bincount(replica, weights=weights * statistics.medians[with_trips], minlength=self.edges.replicas)
+        counts = np.bincount(replica, weights=weights, minlength=self.edges.replicas)
+        return np.divide(sums, counts, out=np.full(self.edges.replicas, np.nan), where=counts > 0)
+
+    def getSolutionStats(self, confidence=0.95):
+        """
+        Summarises the distribution of the solutions of the replicas, replicas
+        without any completed trip are left out
+
+        Arguments:
+            confidence: level of the confidence interval of the mean, based on
+              the normal approximation
+
+        Return:
+            dict with the number of replicas with a solution, the mean and
+            standard deviation of their solutions, the confidence interval of the
+            mean as (lower, upper) and the 5%, 25%, 50%, 75% and 95% quantiles
+        """
+        solutions = self.getSolutions()
+        solutions = solutions[~np.isnan(solutions)]
+        mean = float(solutions.mean()) if len(solutions) else np.nan
+        std = float(solutions.std(ddof=1)) if len(solutions) > 1 else np.nan
+        half_width = NormalDist().inv_cdf((1 + confidence) / 2) * std / np.sqrt(max(len(solutions), 1))
+        return {'replicas': len(solutions),
+                'mean': mean,
+                'std': std,
+                'ci': (mean - half_width, mean + half_width),
+                'quantiles': dict(zip((0.05, 0.25, 0.5, 0.75, 0.95),
+                                      np.quantile(solutions, (0.05, 0.25, 0.5, 0.75, 0.95)).tolist()
+                                      if len(solutions) else [np.nan] * 5))}
 
     def showGraph(self, file_name = ""):
         """
-        prints the graph with variable widths accoridng to pheromone levels
-        In addition optionally saves the graph as .png to a file, if a non empty 
-        name for the file is given
-        """
-        
-        # prepare edges and weights for visualization
-        edges = self.graph.edges()
-        weights = [self.graph_data[u]['pheromones'][v] for u,v in edges]
-        weights_sum = sum(weights)
-        weights = [ (w/weights_sum)*50 for w in weights]
-        
-        # prepare different shades of red to be used to optionally differentiate
-        # between edges with different costs
-        # to show more informatiion on the same graph
-        colors = []
-        max_cost = max([self.graph_data[u]['costs'][v] for u,v in edges])
-        for u,v in edges:
-            if self.graph_data[u]['costs'][v] <= max_cost/32:
-                colors.append('#ff7f7f')
-                continue
-            if self.graph_data[u]['costs'][v] <= max_cost/16:
-                colors.append('#ff6666')
-                continue
-            if self.graph_data[u]['costs'][v] <= max_cost/8:
-                colors.append('#ff4c4c')
-                continue
-            if self.graph_data[u]['costs'][v] <= max_cost/4:
-                colors.append('#ff3232')
-                continue
-            if self.graph_data[u]['costs'][v] <= max_cost/2:
-                colors.append('#ff1919')
-                continue
-            if self.graph_data[u]['costs'][v] <= max_cost:
-                colors.append('#ff0000')
-                continue
-                
-        # print the graph 
-        pos=nx.circular_layout(self.graph)
-        nx.draw( self.graph,pos=pos,node_size=200,node_color='#A8A8A8', with_labels=True,edges=edges, edge_color=colors,edge_cmap=plt.cm.Blues, width=weights)
+        Draws the graph with edge widths according to pheromone levels and shades
+        of red according to costs. If a non empty file name is given, the image is
+        saved as .png to img/file_name without any display, see render.py,
+        otherwise it is shown
+        """
+        from render import graphFrame, drawGraph, renderGraph
+        frame = graphFrame(self)
         if file_name != "":
-            path = "img/"+file_name
-            plt.savefig(path, format="PNG")
-        plt.show()
\ No newline at end of file
+            renderGraph(frame, os.path.join("img", file_name))
+            return
+        import matplotlib.pyplot as plt
+        drawGraph(plt.figure(figsize=(8, 8)).gca(), frame)
+        plt.show()
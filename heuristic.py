@@ -0,0 +1,147 @@
+import heapq
+import numpy as np
+
+"""
+Distance heuristic of the routing rule. With heuristic set in the parameters
+the weight of a half-edge e leading to node v, for an ant heading to dst, is
+
+    pheromone^alpha * (1 + cost(e) * (1 + overload(e))^beta + distance(v, dst))^-gamma
+
+where overload is the current volume of e above its maximum volume and
+distance the length of the shortest path from v to dst by costs. The
+distances to each destination are computed once by a reverse Dijkstra and
+cached; closures and cost changes of scenario events only invalidate the
+tables whose shortest paths they can change.
+"""
+
+class DistanceHeuristic:
+    """
+    Cache of shortest path distances to the destinations of the ants and
+    the heuristic factors computed from them
+
+    Attributes:
+        - rows: row of the distance table of each node, -1 if there is none yet
+        - distances: (destinations x nodes) lengths of the shortest paths to each destination
+        - stale: whether a table has to be computed again before it is used
+        - blocked: whether a half-edge is closed, closed half-edges are not used by shortest paths
+        - changed: whether the network changed since the tables were first computed
+
+    Methods:
+        - table(edges, nodes): adds the distance tables of the nodes and computes
+            all tables which are missing or invalidated
+        - factors(edges, candidates, dst_nodes, parameters) -> heuristic factor
+            of each candidate half-edge for ants heading to dst_nodes
+        - update(edges, half_edges, old_costs, blocked):
+            closes, reopens or changes the costs of half-edges, invalidating
+            the tables whose shortest paths may change
+        - reset(): drops all changes of the network
+    """
+    def __init__(self, edges, nodes=()):
+
+        self.rows = np.full(len(edges.offsets) - 1, -1, dtype=np.int64)
+        self.distances = np.zeros((0, len(edges.offsets) - 1))
+        self.stale = np.zeros(0, dtype=bool)
+        self.blocked = np.zeros(len(edges.neighbors), dtype=bool)
+        self.changed = False
+        self.table(edges, nodes)
+
+    def effectiveCosts(self, edges):
+        return np.where(self.blocked, np.inf, edges.costs)
+
+    def dijkstra(self, target, offsets, neighbors, reverse, costs):
+        """
+        Returns the lengths of the shortest paths from all nodes to target,
+        walking the half-edges backwards; the arrays are given as lists
+        """
+        distances = [np.inf] * (len(offsets) - 1)
+        distances[target] = 0.0
+        heap = [(0.0, target)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > distances[node]:
+                continue
+            # the half-edge reverse[e] leads from neighbors[e] to node
+            for e in range(offsets[node], offsets[node + 1]):
+                previous = neighbors[e]
+                candidate = distance + costs[reverse[e]]
+                if candidate < distances[previous]:
+                    distances[previous] = candidate
+                    heapq.heappush(heap, (candidate, previous))
+        return distances
+
+    def table(self, edges, nodes):
+        nodes = np.unique(np.asarray(nodes, dtype=np.int64))
+        new = nodes[self.rows[nodes] < 0]
+        if len(new):
+            self.rows[new] = len(self.distances) + np.arange(len(new))
+            self.distances = np.concatenate([self.distances, np.zeros((len(new), self.distances.shape[1]))])
+            self.stale = np.concatenate([self.stale, np.ones(len(new), dtype=bool)])
+
+        # compute the missing and invalidated tables, the arrays are converted once for all of them
+        stale = np.flatnonzero(self.stale)
+        if len(stale):
+            arrays = (edges.offsets.tolist(), edges.neighbors.tolist(), edges.reverse.tolist(),
+                      self.effectiveCosts(edges).tolist())
+            targets = np.empty(len(self.distances), dtype=np.int64)
+            targets[self.rows[self.rows >= 0]] = np.flatnonzero(self.rows >= 0)
+            for row in stale:
+                self.distances[row] = self.dijkstra(int(targets[row]), *arrays)
+            self.stale[stale] = False
+
+    def factors(self, edges, candidates, dst_nodes, parameters):
+        """
+        Returns the heuristic factor of each candidate half-edge
+
+        Arguments:
+            edges: EdgeStore with all data about nodes & edges
+            candidates: array of half-edges, one row per ant for 2D arrays
+            dst_nodes: destination of the ant choosing among each row of
+                candidates, a single node for 1D candidates
+            parameters: dict of all steering parameters
+
+        Return:
+            array of the shape of candidates
+        """
+        dst_nodes = np.asarray(dst_nodes)
+        rows = self.rows[dst_nodes]
+        if (rows < 0).any() or self.stale.any():
+            self.table(edges, np.atleast_1d(dst_nodes))
+            rows = self.rows[dst_nodes]
+        overload = np.maximum(edges.cur_vol[edges.edge_ids[candidates]] - edges.max_vol[candidates], 0)
+        distance = self.distances[rows[..., None] if candidates.ndim > 1 else rows, edges.neighbors[candidates]]
+        length = 1 + edges.costs[candidates] * (1 + overload) ** parameters['beta'] + distance
+        return length ** -parameters['gamma']
+
+    def update(self, edges, half_edges, old_costs=None, blocked=None):
+        """
+        Applies a change of the network to the cache
+
+        Arguments:
+            edges: EdgeStore with all data about nodes & edges, the costs already changed
+            half_edges: array of the changed half-edges
+            old_costs: costs of the half-edges before the change, the current ones if None
+            blocked: whether the half-edges are closed now, unchanged if None
+        """
+        half_edges = np.asarray(half_edges, dtype=np.int64)
+        old = np.where(self.blocked[half_edges], np.inf,
+                       edges.costs[half_edges] if old_costs is None else old_costs)
+        if blocked is not None:
+            self.blocked[half_edges] = blocked
+        new = self.effectiveCosts(edges)[half_edges]
+        self.changed = True
+
+        # a table changes if a half-edge u -> v was on a shortest path and got
+        # longer, or if it got shorter than the shortest path from u
+        sources = np.repeat(np.arange(len(edges.offsets) - 1), np.diff(edges.offsets))[half_edges]
+        to_u = self.distances[:, sources]
+        via_v = self.distances[:, edges.neighbors[half_edges]]
+        with np.errstate(invalid='ignore'):
+            longer = (new > old) & np.isclose(to_u, via_v + old) & np.isfinite(to_u)
+            shorter = (new < old) & (via_v + new < to_u)
+        self.stale |= (longer | shorter).any(axis=1)
+
+    def reset(self):
+        if self.changed:
+            self.blocked[:] = False
+            self.stale[:] = True
+            self.changed = False
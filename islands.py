@@ -0,0 +1,208 @@
+from graph import Graph
+from convergence import ConvergenceMonitor
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+from multiprocessing.shared_memory import SharedMemory
+from threading import BrokenBarrierError, Event, Thread
+import traceback
+import numpy as np
+
+"""
+Island model: several colonies simulate the same scenario in separate
+processes, each one a Graph with its share of ant_number and its own random
+stream, and merge their pheromones every interval steps:
+
+    - average: every island takes the mean of the pheromone levels of all islands
+    - best: every island takes the pheromone levels of the island with the
+      lowest getSolution(), islands without a completed trip never are the best
+
+With rate below 1 an island only moves that part of the way from its own
+levels to the merged ones. The islands exchange their pheromone levels
+through one block of shared memory with a row per island, the last two
+columns of a row holding the solution of the island and whether it
+converged; a barrier keeps the islands in step. Island 0 runs in the
+calling process, so the result is an ordinary Graph. An island failing,
+killed or waiting longer than timeout at the barrier breaks it, so the
+other islands stop and performIslands() raises a RuntimeError.
+
+A network given by network_path is memory-mapped by all islands, so they
+share one copy of it. With convergence_tolerance set every island keeps
+one ConvergenceMonitor over all its intervals, and the islands stop at the
+first exchange at which all of them converged; converged_step of each
+island is the step at which it converged itself.
+"""
+
+MODES = ('average', 'best')
+
+def _shareAnts(ant_number, islands):
+    # the first ant_number % islands islands get one ant more
+    return [ant_number // islands + (island < ant_number % islands) for island in range(islands)]
+
+def _exchange(graph, table, island, barrier, mode, rate, last):
+    """
+    Writes the state of the island to its row of table, waits for the other
+    islands and sets the pheromone levels of graph to the merged ones
+
+    Return:
+        whether the simulation is finished
+    """
+    edge_number = table.shape[1] - 2
+    table[island, :edge_number] = graph.edges.pheromones
+    table[island, edge_number] = graph.getSolution()
+    table[island, edge_number + 1] = graph.converged_step is not None
+    barrier.wait()
+
+    if mode == 'average':
+        merged = table[:, :edge_number].mean(axis=0)
+    else:
+        solutions = table[:, edge_number]
+        merged = table[np.argmin(np.where(np.isnan(solutions), np.inf, solutions)), :edge_number].copy()
+    finished = last or bool(table[:, edge_number + 1].all())
+    # nobody writes its next state before all islands read this one
+    barrier.wait()
+
+    pheromones = graph.edges.pheromones
+    pheromones += rate * (merged - pheromones)
+    graph.edges.invalidateWeights()
+    graph.graph_dirty = True
+    return finished
+
+def _simulateIsland(graph, table, island, barrier, interval, mode, rate):
+    # performSimulation() would start a new monitor for every interval and
+    # stop within it, the monitor of the island watches all intervals instead
+    tolerance = graph.parameters.pop('convergence_tolerance', None)
+    monitor = None
+    if tolerance:
+        monitor = ConvergenceMonitor(tolerance, graph.parameters.get('convergence_window', 10),
+                                     graph.parameters.get('convergence_patience', 10),
+                                     graph.parameters.get('convergence_norm', 'l1'))
+        graph.addRecorder(monitor)
+    try:
+        steps = graph.parameters['steps']
+        for start in range(0, steps, interval):
+            graph.parameters['steps'] = min(interval, steps - start)
+            graph.performSimulation()
+            graph.converged_step = monitor.converged_step if monitor else None
+            if _exchange(graph, table, island, barrier, mode, rate, start + interval >= steps):
+                break
+        graph.parameters['steps'] = 0
+    finally:
+        if monitor:
+            graph.recorders.remove(monitor)
+        if tolerance is not None:
+            graph.parameters['convergence_tolerance'] = tolerance
+
+def _watchIslands(workers, barrier, finished):
+    """
+    Breaks the barrier as soon as a worker ends with a non-zero exit code,
+    e.g. killed by a signal before it could break the barrier itself
+    """
+    sentinels = {worker.sentinel: worker for worker in workers}
+    while sentinels and not finished.is_set():
+        for sentinel in wait(list(sentinels), timeout=0.1):
+            # the sentinel is ready as the worker exits, join waits until its exit code is known
+            worker = sentinels.pop(sentinel)
+            worker.join()
+            if worker.exitcode != 0:
+                barrier.abort()
+                return
+
+def _runIsland(island, parameters, name, shape, barrier, errors, interval, mode, rate):
+    memory = SharedMemory(name=name)
+    table = np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+    try:
+        _simulateIsland(Graph(parameters), table, island, barrier, interval, mode, rate)
+    except BrokenBarrierError:
+        pass
+    except BaseException:
+        # the other islands must not wait for this one anymore
+        barrier.abort()
+        errors.put((island, traceback.format_exc()))
+    finally:
+        # the shared memory can only be closed once no array uses it anymore
+        del table
+        memory.close()
+
+def performIslands(parameters, islands=None, interval=10, mode='average', rate=1.0, context=None, timeout=None):
+    """
+    Simulates parameters with the ants split among islands, colonies in
+    separate processes merging their pheromones every interval steps
+
+    Arguments:
+        parameters: setup variables of the scenario, ant_number being the
+            total number of ants of all islands; the seeds of the islands
+            are spawned from seed
+        islands: number of islands, all cores if None
+        interval: number of steps between two exchanges of pheromones
+        mode: 'average' or 'best', how the pheromones of the islands are merged
+        rate: part of the way from its own pheromone levels to the merged ones
+            an island goes at each exchange
+        context: multiprocessing context or start method the islands are started with
+        timeout: seconds an island waits for the others at an exchange before
+            the run fails, no limit if None
+
+    Return:
+        graph: Graph of island 0 with the merged pheromone levels
+        solutions: array with the getSolution() value of each island
+    """
+    if mode not in MODES:
+        raise ValueError("mode has to be one of " + str(MODES) + ", not '" + str(mode) + "'")
+    if interval < 1:
+        raise ValueError("interval has to be at least 1")
+    context = get_context(context) if context is None or isinstance(context, str) else context
+    islands = islands or context.cpu_count()
+    if islands > parameters['ant_number']:
+        raise ValueError("every island needs at least one ant, " + str(parameters['ant_number']) + " ants for " +
+                         str(islands) + " islands")
+    ant_numbers = _shareAnts(parameters['ant_number'], islands)
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(parameters.get('seed')).spawn(islands)]
+    island_parameters = [dict(parameters, ant_number=ant_numbers[island], seed=seeds[island]) for island in range(islands)]
+
+    graph = Graph(island_parameters[0])
+    shape = (islands, len(graph.edges.raw_pheromones) + 2)
+    memory = SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+    barrier = context.Barrier(islands, timeout=timeout)
+    errors = context.Queue()
+    workers = [context.Process(target=_runIsland, args=(island, island_parameters[island], memory.name, shape,
+                                                        barrier, errors, interval, mode, rate), daemon=True)
+               for island in range(1, islands)]
+    table = np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+    finished = Event()
+    try:
+        for worker in workers:
+            worker.start()
+        watcher = Thread(target=_watchIslands, args=(workers, barrier, finished), daemon=True)
+        watcher.start()
+        try:
+            _simulateIsland(graph, table, 0, barrier, interval, mode, rate)
+        except BrokenBarrierError:
+            pass
+        except BaseException:
+            barrier.abort()
+            raise
+        finally:
+            # after a failure the workers still simulating are not waited for,
+            # they are terminated below
+            for worker in workers:
+                worker.join(1 if barrier.broken else None)
+            finished.set()
+            watcher.join()
+        if barrier.broken:
+            if not errors.empty():
+                island, message = errors.get()
+                raise RuntimeError("island " + str(island) + " failed:\n" + message)
+            # workers are islands 1, 2, ...
+            stopped = {island: worker.exitcode for island, worker in enumerate(workers, 1) if worker.exitcode}
+            if stopped:
+                raise RuntimeError("islands stopped without an error, exit codes by island " + str(stopped))
+            raise RuntimeError("the islands waited longer than " + str(timeout) + " seconds for each other")
+        solutions = table[:, -2].copy()
+    finally:
+        finished.set()
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        del table
+        memory.close()
+        memory.unlink()
+    return graph, solutions
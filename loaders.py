@@ -0,0 +1,149 @@
+from array import array
+import csv
+import xml.etree.ElementTree as ET
+import numpy as np
+
+"""
+Loaders of sparse street networks. Every loader reads its input in one
+streaming pass into compact typed buffers and returns the network as a
+dict of arrays which can be passed to EdgeStore.fromEdgeList():
+
+    node_number, sources, targets, costs, max_vols, costs_back, max_vols_back
+
+Each edge is given as (source, target[, cost[, max_vol[, cost_back, max_vol_back]]]),
+missing costs and maximum volumes are 1, missing backward values equal the forward ones.
+Edges of one network may be given with different numbers of attributes, e.g.
+symmetric edges with 2 and asymmetric ones with 4. Files naming their
+attributes, csv and GraphML, may give any of them, each is taken by its name.
+"""
+
+ATTRIBUTES = ('cost', 'max_vol', 'cost_back', 'max_vol_back')
+
+class _EdgeBuffer:
+    """
+    Growing typed buffers collecting the edges of a network, the missing
+    attributes of each edge are filled in, width is the most attributes
+    any edge was given with
+    """
+    def __init__(self):
+        self.sources, self.targets = array('q'), array('q')
+        self.columns = [array('d') for _ in range(4)]
+        self.width = 0
+
+    def append(self, source, target, values):
+        if len(values) not in (0, 1, 2, 4):
+            raise ValueError("edge (" + str(source) + "," + str(target) + ") has " + str(len(values)) +
+                             " attributes, edges need 0, 1, 2 or 4")
+        self.width = max(self.width, len(values))
+        values = [float(value) for value in values] + [1.0] * (2 - len(values))
+        if len(values) == 2:
+            values += values
+        self.store(source, target, values)
+
+    def appendNamed(self, source, target, attributes):
+        # attributes maps names of ATTRIBUTES to values, missing or empty ones get the defaults
+        values = {name: float(attributes[name]) for name in ATTRIBUTES if attributes.get(name) not in (None, '')}
+        self.width = max([self.width] + [ATTRIBUTES.index(name) + 1 for name in values])
+        cost, max_vol = values.get('cost', 1.0), values.get('max_vol', 1.0)
+        self.store(source, target, [cost, max_vol, values.get('cost_back', cost), values.get('max_vol_back', max_vol)])
+
+    def store(self, source, target, values):
+        self.sources.append(source)
+        self.targets.append(target)
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def toNetwork(self, node_number=None):
+        sources = np.frombuffer(self.sources, dtype=np.int64) if len(self.sources) else np.zeros(0, dtype=np.int64)
+        targets = np.frombuffer(self.targets, dtype=np.int64) if len(self.targets) else np.zeros(0, dtype=np.int64)
+        columns = [np.frombuffer(column, dtype=np.float64) if i < self.width else None
+                   for i, column in enumerate(self.columns)]
+        if node_number is None:
+            node_number = int(max(sources.max(), targets.max())) + 1 if len(sources) else 0
+        return {'node_number': node_number, 'sources': sources, 'targets': targets,
+                'costs': columns[0], 'max_vols': columns[1],
+                'costs_back': columns[2], 'max_vols_back': columns[3]}
+
+def fromTuples(edges, node_number=None):
+    """
+    Converts a list of edge tuples (source, target[, cost[, max_vol[, cost_back, max_vol_back]]])
+    into a network
+    """
+    buffer = _EdgeBuffer()
+    for edge in edges:
+        buffer.append(edge[0], edge[1], edge[2:])
+    return buffer.toNetwork(node_number)
+
+def readEdgeList(path, node_number=None):
+    """
+    Reads a whitespace separated edge list, one edge per line:
+        source target [cost [max_vol [cost_back max_vol_back]]]
+    Empty lines and lines starting with # are skipped
+    """
+    buffer = _EdgeBuffer()
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            buffer.append(int(fields[0]), int(fields[1]), fields[2:])
+    return buffer.toNetwork(node_number)
+
+def readCsv(path, node_number=None):
+    """
+    Reads a csv file with a header line naming the columns source, target and
+    any of cost, max_vol, cost_back, max_vol_back in any order; missing or
+    empty costs and maximum volumes are 1, backward ones equal the forward ones
+    """
+    buffer = _EdgeBuffer()
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        source, target = header.index('source'), header.index('target')
+        columns = {name: header.index(name) for name in ATTRIBUTES if name in header}
+        for row in reader:
+            if row:
+                buffer.appendNamed(int(row[source]), int(row[target]),
+                                   {name: row[i] for name, i in columns.items()})
+    return buffer.toNetwork(node_number)
+
+def readGraphml(path, node_number=None):
+    """
+    Reads a GraphML file, edge attributes are taken from the data keys named
+    cost, max_vol, cost_back and max_vol_back, each edge may give any of them
+    with the defaults of readCsv() for the others. Nodes with integer ids keep them,
+    other ids are numbered in the order the nodes appear
+    """
+    buffer = _EdgeBuffer()
+    keys, nodes = {}, {}
+
+    def nodeNumber(node_id):
+        if node_id not in nodes:
+            nodes[node_id] = int(node_id) if node_id.isdigit() else len(nodes)
+        return nodes[node_id]
+
+    for _, element in ET.iterparse(path):
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag == 'key':
+            keys[element.get('id')] = element.get('attr.name')
+        elif tag == 'node':
+            nodeNumber(element.get('id'))
+            element.clear()
+        elif tag == 'edge':
+            data = {keys.get(child.get('key')): child.text for child in element}
+            buffer.appendNamed(nodeNumber(element.get('source')), nodeNumber(element.get('target')), data)
+            element.clear()
+    if node_number is None and nodes:
+        node_number = max(nodes.values()) + 1
+    return buffer.toNetwork(node_number)
+
+def readNetwork(path, node_number=None):
+    """
+    Reads a network file, the format is chosen by the file extension:
+    .csv, .graphml, anything else is read as an edge list
+    """
+    if path.endswith('.csv'):
+        return readCsv(path, node_number)
+    if path.endswith('.graphml'):
+        return readGraphml(path, node_number)
+    return readEdgeList(path, node_number)
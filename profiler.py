@@ -0,0 +1,106 @@
+import graph as graph_module
+from graph import Graph
+from ant import Ant
+from colony import Colony
+from flow import Flow
+from time import perf_counter
+import cProfile
+import json
+
+"""
+Profiling of the simulation loop. While a Profiler is active, the methods
+implementing each phase of a step are wrapped to count their calls and sum
+up the time spent in them; when it is not active nothing is wrapped, so
+there is no cost at all. Times are inclusive: the time of a move contains
+the time of its routing and deposit.
+
+    with Profiler() as profiler:
+        graph.performSimulation()
+    print(profiler.summary())
+
+Setting profile in the parameters of a Graph does the same for one
+performSimulation(), see Graph.performSimulation().
+"""
+
+class Profiler:
+    """
+    Context manager timing and counting the phases of the simulation
+
+    Attributes:
+        - phases: dict mapping the name of each phase to the (owner, name)
+            pairs of the functions implementing it
+        - times: total time spent in each phase in seconds
+        - counts: number of calls of each phase
+        - step_range: (first, last) steps around which hook is enabled, None to enable it never
+        - hook: object with enable() and disable() methods, e.g. cProfile.Profile(),
+            enabled from step first up to step last; a cProfile.Profile if not given
+
+    Methods:
+        - summary() -> dict with times and counts of all phases
+        - save(path): writes summary() as JSON to path
+    """
+    phases = {'step': [(Graph, 'performStep')],
+              'move': [(Ant, 'move'), (Colony, 'move'), (Flow, 'move')],
+              'routing': [(Ant, 'findNext'), (Colony, 'findNext'), (Flow, 'findNext')],
+              'deposit': [(Ant, 'depositPheromones'), (Colony, 'depositPheromones'), (Flow, 'depositPheromones')],
+              'evaporation': [(Graph, 'evaporatePheromones')],
+              'events': [(graph_module, 'applyEvent')],
+              'graph_sync': [(Graph, 'toNetworkx')],
+              'checkpoint': [(Graph, 'saveCheckpoint')]}
+
+    def __init__(self, step_range=None, hook=None):
+
+        self.times = {phase: 0.0 for phase in self.phases}
+        self.counts = {phase: 0 for phase in self.phases}
+        self.step_range = step_range
+        self.hook = hook if hook is not None or step_range is None else cProfile.Profile()
+        self.originals = []
+
+    def wrap(self, phase, function):
+        times, counts = self.times, self.counts
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[phase] += perf_counter() - start
+                counts[phase] += 1
+        return timed
+
+    def wrapStep(self, function):
+        first, last = self.step_range
+        hook = self.hook
+
+        # the hook is enabled only around the steps in the chosen range
+        def hooked(graph, *args, **kwargs):
+            if first <= graph.step <= last:
+                hook.enable()
+                try:
+                    return function(graph, *args, **kwargs)
+                finally:
+                    hook.disable()
+            return function(graph, *args, **kwargs)
+        return hooked
+
+    def __enter__(self):
+        for phase, functions in self.phases.items():
+            for owner, name in functions:
+                function = owner.__dict__[name]
+                self.originals.append((owner, name, function))
+                setattr(owner, name, self.wrap(phase, function))
+        if self.step_range is not None:
+            setattr(Graph, 'performStep', self.wrapStep(Graph.performStep))
+        return self
+
+    def __exit__(self, *args):
+        for owner, name, function in reversed(self.originals):
+            setattr(owner, name, function)
+        self.originals = []
+
+    def summary(self):
+        return {'times': dict(self.times), 'counts': dict(self.counts)}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
@@ -0,0 +1,44 @@
+import numpy as np
+
+class RandomStream:
+    """
+    Class handing out uniform random numbers from [0, 1) which are drawn
+    from a numpy Generator in large blocks, so that single draws in the
+    innermost loop do not pay for a call into numpy each
+
+    Attributes:
+        - generator: numpy.random.Generator the numbers are drawn from
+        - block_size: number of values drawn from generator at once
+        - block: array of values drawn last
+        - position: index of the next value in block to hand out
+
+    Methods:
+        - uniform() -> next value
+        - uniforms(n) -> array with the next n values
+    """
+    def __init__(self, seed=None, block_size=4096):
+
+        self.generator = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.block = np.empty(0)
+        self.position = 0
+
+    def uniform(self):
+        if self.position == len(self.block):
+            self.block = self.generator.random(self.block_size)
+            self.position = 0
+        self.position += 1
+        return self.block[self.position - 1]
+
+    def uniforms(self, n):
+        values = np.empty(n)
+        taken = 0
+        while taken < n:
+            if self.position == len(self.block):
+                self.block = self.generator.random(max(self.block_size, n - taken))
+                self.position = 0
+            count = min(n - taken, len(self.block) - self.position)
+            values[taken:taken + count] = self.block[self.position:self.position + count]
+            self.position += count
+            taken += count
+        return values
@@ -0,0 +1,180 @@
+import json
+import os
+import numpy as np
+
+"""
+Recorders capture the state of a simulation while it runs. A Graph calls
+record() of each of its recorders after every step, a recorder takes a
+snapshot every interval steps and hands it to its sink:
+
+    - RingBufferRecorder keeps the last snapshots in preallocated arrays
+    - NpyRecorder writes snapshots in columnar chunks of .npy files
+    - NdjsonRecorder writes one JSON line per snapshot
+    - PrintRecorder prints the state of the graph, as verbose did
+
+A snapshot consists of the step, the pheromone level and current volume of
+each edge, the cost of the current trip of each ant and the cost of its
+last completed trip (nan if there is none yet). Demand events change the
+number of ants during a run, the arrays of RingBufferRecorder and
+NpyRecorder then have one column per ant of the snapshot with the most
+ants, the columns beyond the ants of a snapshot are padded with nan.
+"""
+
+def _padding(dtype):
+    return np.nan if dtype.kind == 'f' else 0
+
+def _stack(rows):
+    """
+    Stacks 2D arrays of snapshots along their first axis, padding the shorter rows
+    """
+    width = max(row.shape[1] for row in rows)
+    stacked = np.full((sum(len(row) for row in rows), width), _padding(rows[0].dtype), dtype=rows[0].dtype)
+    start = 0
+    for row in rows:
+        stacked[start:start + len(row), :row.shape[1]] = row
+        start += len(row)
+    return stacked
+
+class Recorder:
+    """
+    Base class of all recorders
+
+    Attributes:
+        - interval: number of steps between two snapshots
+
+    Methods:
+        - record(graph): takes a snapshot of graph if its step is due
+        - write(step, snapshot): stores one snapshot, implemented by the sinks
+        - flush(): writes out buffered snapshots, called at the end of a simulation
+        - close(): flushes and releases resources of the sink
+    """
+    def __init__(self, interval=1):
+        self.interval = interval
+
+    def record(self, graph):
+        if graph.step % self.interval == 0:
+            self.write(graph.step, {'pheromones': graph.edges.pheromones,
+                                    'cur_vol': graph.edges.cur_vol,
+                                    'cost_sum': graph.colony.cost_sum,
+                                    'last_pass': graph.colony.last_pass})
+
+    def write(self, step, snapshot):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class RingBufferRecorder(Recorder):
+    """
+    Keeps the last capacity snapshots in arrays allocated on the first snapshot,
+    the arrays grow if a later snapshot has more ants
+    """
+    def __init__(self, capacity, interval=1):
+        super().__init__(interval)
+        self.capacity = capacity
+        self.buffers = None
+        self.steps = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+
+    def write(self, step, snapshot):
+        if self.buffers is None:
+            self.buffers = {name: np.empty((self.capacity,) + values.shape, dtype=values.dtype)
+                            for name, values in snapshot.items()}
+        slot = self.count % self.capacity
+        self.steps[slot] = step
+        for name, values in snapshot.items():
+            buffer = self.buffers[name]
+            if values.ndim == 1 and len(values) != buffer.shape[1]:
+                if len(values) > buffer.shape[1]:
+                    buffer = self.buffers[name] = _stack([buffer, np.empty((0, len(values)), dtype=buffer.dtype)])
+                buffer[slot, len(values):] = _padding(buffer.dtype)
+                buffer[slot, :len(values)] = values
+            else:
+                buffer[slot] = values
+        self.count += 1
+
+    def snapshots(self):
+        """
+        Returns the stored snapshots as a dict of arrays with the oldest snapshot first
+        """
+        order = np.arange(max(0, self.count - self.capacity), self.count) % self.capacity
+        snapshots = {name: values[order] for name, values in (self.buffers or {}).items()}
+        snapshots['step'] = self.steps[order]
+        return snapshots
+
+
+class NpyRecorder(Recorder):
+    """
+    Collects snapshots in chunks of chunk_size and writes every chunk as one
+    .npy file per attribute to directory: step_00000.npy, pheromones_00000.npy, ...
+    Use load() to read them back
+    """
+    def __init__(self, directory, chunk_size=1000, interval=1):
+        super().__init__(interval)
+        self.directory = directory
+        self.chunk = RingBufferRecorder(chunk_size)
+        self.chunk_number = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, step, snapshot):
+        self.chunk.write(step, snapshot)
+        if self.chunk.count == self.chunk.capacity:
+            self.flush()
+
+    def flush(self):
+        if self.chunk.count == 0:
+            return
+        for name, values in self.chunk.snapshots().items():
+            np.save(os.path.join(self.directory, "%s_%05d.npy" % (name, self.chunk_number)), values)
+        self.chunk.count = 0
+        self.chunk_number += 1
+
+    @staticmethod
+    def load(directory):
+        """
+        Reads all chunks written to directory
+
+        Return:
+            dict of arrays with one row per snapshot
+        """
+        chunks = {}
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith('.npy'):
+                name = file_name[:-len("_00000.npy")]
+                chunks.setdefault(name, []).append(np.load(os.path.join(directory, file_name)))
+        return {name: _stack(values) if values[0].ndim == 2 else np.concatenate(values) for name, values in chunks.items()}
+
+
+class NdjsonRecorder(Recorder):
+    """
+    Writes one JSON object per snapshot and line to the file at path
+    """
+    def __init__(self, path, interval=1):
+        super().__init__(interval)
+        self.file = open(path, 'w')
+
+    def write(self, step, snapshot):
+        line = {name: np.where(np.isnan(values), None, values).tolist() if values.dtype.kind == 'f' else values.tolist()
+                for name, values in snapshot.items()}
+        line['step'] = step
+        self.file.write(json.dumps(line) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class PrintRecorder(Recorder):
+    """
+    Prints the current state of the graph, used by performSimulation() if verbose is set
+    """
+    def record(self, graph):
+        if graph.step % self.interval == 0:
+            print("Performed step", graph.step)
+            graph.showState()
@@ -0,0 +1,257 @@
+import os
+from multiprocessing import Pool
+from weakref import WeakKeyDictionary
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from recorder import Recorder
+
+"""
+Headless rendering of graphs and heatmaps to PNG files. Figures are drawn
+on the Agg canvas without pyplot, so rendering neither needs a display nor
+blocks on one:
+
+    - graphFrame(graph): picklable snapshot of everything needed to draw a graph
+    - renderGraph(frame, path): draws a frame, edge widths proportional to the
+      pheromone levels and shades of red dependent on the costs
+    - renderHeatmap(values, ...): draws a 2D array, e.g. the solutions of a sweep
+    - RenderPool: renders frames and heatmaps in background processes
+    - FrameRecorder: recorder rendering a frame every interval steps
+
+Node positions are computed once per EdgeStore and layout and cached with
+the store, so drawing a frame does not depend on the size of the network
+beyond copying its state.
+"""
+
+# shades of red of the edges, from the cheapest to the most expensive
+COST_COLORS = np.array(['#ff7f7f', '#ff6666', '#ff4c4c', '#ff3232', '#ff1919', '#ff0000'])
+
+# node positions of each EdgeStore by layout, dropped with the store, see layout()
+_layouts = WeakKeyDictionary()
+
+def layout(edges, kind='circular'):
+    """
+    Returns the positions of the nodes of a network, computed on first use
+    only; events never change the nodes and edges of a store
+
+    Arguments:
+        edges: EdgeStore of the network, with replicas the positions are
+            those of the nodes of the original network
+        kind: 'circular' or 'spring', the layout of networkx to use
+
+    Return:
+        (nodes x 2) array of positions
+    """
+    cached = _layouts.setdefault(edges, {})
+    if kind not in cached:
+        edges = edges.replicaMean() if edges.replicas > 1 else edges
+        node_number = len(edges.offsets) - 1
+        if kind == 'circular':
+            # same positions as nx.circular_layout
+            angles = np.linspace(0, 2 * np.pi, node_number, endpoint=False)
+            positions = np.stack([np.cos(angles), np.sin(angles)], axis=1) if node_number > 1 else np.zeros((node_number, 2))
+        elif kind == 'spring':
+            import networkx as nx
+            u, v = edges.endpoints()
+            graph = nx.Graph()
+            graph.add_nodes_from(range(node_number))
+            graph.add_edges_from(zip(u.tolist(), v.tolist()))
+            spring = nx.spring_layout(graph, seed=0)
+            positions = np.array([spring[node] for node in range(node_number)]).reshape(node_number, 2)
+        else:
+            raise ValueError("layout has to be 'circular' or 'spring', not '" + str(kind) + "'")
+        cached[kind] = positions
+    return cached[kind]
+
+def graphFrame(graph, kind='circular'):
+    """
+    Copies the state of graph needed by renderGraph()
+
+    Arguments:
+        graph: Graph to draw
+        kind: layout of the nodes, see layout()
+
+    Return:
+        dict with the step, the node positions, the endpoints u and v of each
+        undirected edge, its pheromone level and the cost of its direction u -> v;
+        with replicas those of the original network, pheromones averaged over the replicas
+    """
+    edges = graph.edges.replicaMean()
+    u, v = edges.endpoints()
+    # the half-edge going from u to v of each undirected edge
+    sources = np.repeat(np.arange(len(edges.offsets) - 1), np.diff(edges.offsets))
+    forward = np.flatnonzero(sources <= edges.neighbors)
+    half_edges = np.zeros(len(u), dtype=np.int64)
+    half_edges[edges.edge_ids[forward]] = forward
+    return {'step': graph.step,
+            'positions': layout(graph.edges, kind),
+            'u': u,
+            'v': v,
+            'pheromones': np.array(edges.pheromones),
+            'costs': np.array(edges.costs[half_edges])}
+
+def edgeStyle(pheromones, costs):
+    """
+    Returns the width and colour of each edge: widths sum up to 50, costs above
+    max/2 are drawn in full red, each halving of the cost brightens the shade,
+    down to the brightest for costs of at most max/32
+    """
+    total = pheromones.sum()
+    widths = pheromones / total * 50 if total > 0 else np.ones(len(pheromones))
+    max_cost = costs.max() if len(costs) else 0
+    shades = np.searchsorted(max_cost / np.array([32, 16, 8, 4, 2]), costs, side='left')
+    return widths, COST_COLORS[shades]
+
+def drawGraph(axes, frame, labels=None):
+    """
+    Draws a frame of graphFrame() onto axes
+
+    Arguments:
+        axes: matplotlib axes to draw onto
+        frame: dict returned by graphFrame()
+        labels: whether to label the nodes with their numbers,
+            if None only networks of at most 100 nodes are labeled
+    """
+    positions = frame['positions']
+    widths, colors = edgeStyle(frame['pheromones'], frame['costs'])
+    segments = np.stack([positions[frame['u']], positions[frame['v']]], axis=1)
+    axes.add_collection(LineCollection(segments, linewidths=widths, colors=colors, zorder=1))
+    axes.scatter(positions[:, 0], positions[:, 1], s=200, c='#A8A8A8', zorder=2)
+    if labels or (labels is None and len(positions) <= 100):
+        for node, (x, y) in enumerate(positions.tolist()):
+            axes.text(x, y, str(node), ha='center', va='center', fontsize=10, zorder=3)
+    axes.set_title("step " + str(frame['step']))
+    axes.set_aspect('equal')
+    axes.autoscale_view()
+    axes.set_axis_off()
+
+def saveFigure(figure, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    FigureCanvasAgg(figure)
+    figure.savefig(path, format="PNG")
+
+def renderGraph(frame, path, labels=None, size=(8, 8)):
+    """
+    Draws a frame of graphFrame() and saves it as PNG to path
+    """
+    figure = Figure(figsize=size)
+    drawGraph(figure.add_subplot(111), frame, labels)
+    saveFigure(figure, path)
+    return path
+
+def renderHeatmap(values, path, x_values=None, y_values=None, x_label="", y_label="", title="", size=(8, 6)):
+    """
+    Draws a 2D array as a heatmap and saves it as PNG to path
+
+    Arguments:
+        values: 2D array, rows along the x axis and columns along the y axis,
+            the shape of a two parameter sweep; nan cells stay blank
+        path: file the PNG is written to
+        x_values, y_values: tick labels of the rows and columns, their indices if None
+        x_label, y_label, title: texts of the axes and of the figure
+    """
+    values = np.asarray(values, dtype=np.float64)
+    figure = Figure(figsize=size)
+    axes = figure.add_subplot(111)
+    image = axes.imshow(values.T, origin='lower', aspect='auto', cmap='viridis')
+    figure.colorbar(image, ax=axes)
+    if x_values is not None:
+        axes.set_xticks(range(len(x_values)), ["%.3g" % x for x in x_values])
+    if y_values is not None:
+        axes.set_yticks(range(len(y_values)), ["%.3g" % y for y in y_values])
+    axes.set_xlabel(x_label)
+    axes.set_ylabel(y_label)
+    axes.set_title(title)
+    saveFigure(figure, path)
+    return path
+
+
+class RenderPool:
+    """
+    Pool of background processes rendering images while the simulation goes on
+
+    Attributes:
+        - processes: number of worker processes, 0 renders in the calling process
+        - max_pending: number of images rendered at most at once, submitting
+            another one waits for the oldest
+        - pending: results of the images submitted and not finished yet
+        - rendered: paths of the finished images not returned by wait() yet
+
+    Methods:
+        - renderGraph(graph, path): renders the current state of graph to path
+        - renderHeatmap(values, path, **options): renders a heatmap to path
+        - wait() -> paths of all images rendered since the last call,
+            raises the errors of failed renders
+        - close(): waits for all images and stops the workers
+    """
+    def __init__(self, processes=1, max_pending=64):
+
+        self.processes = processes
+        self.max_pending = max_pending
+        self.pending = []
+        self.rendered = []
+        self.pool = Pool(processes) if processes > 0 else None
+
+    def submit(self, function, *args, **kwargs):
+        if self.pool is None:
+            self.rendered.append(function(*args, **kwargs))
+            return
+        while len(self.pending) >= self.max_pending:
+            self.rendered.append(self.pending.pop(0).get())
+        self.pending.append(self.pool.apply_async(function, args, kwargs))
+
+    def renderGraph(self, graph, path, kind='circular', labels=None):
+        # the frame is a copy, so the simulation can go on while it is drawn
+        self.submit(renderGraph, graphFrame(graph, kind), path, labels)
+
+    def renderHeatmap(self, values, path, **options):
+        self.submit(renderHeatmap, np.array(values), path, **options)
+
+    def wait(self):
+        rendered = self.rendered + [result.get() for result in self.pending]
+        self.pending, self.rendered = [], []
+        return rendered
+
+    def close(self):
+        self.wait()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FrameRecorder(Recorder):
+    """
+    Renders the graph every interval steps to directory/frame_00000.png, ...
+    in the background processes of a RenderPool, its own one if none is given
+    """
+    def __init__(self, directory, interval=1, pool=None, kind='circular', labels=None):
+        super().__init__(interval)
+        self.directory = directory
+        self.kind = kind
+        self.labels = labels
+        self.own_pool = pool is None
+        self.pool = RenderPool() if pool is None else pool
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, graph):
+        if graph.step % self.interval == 0:
+            self.pool.renderGraph(graph, os.path.join(self.directory, "frame_%05d.png" % graph.step), self.kind, self.labels)
+
+    def flush(self):
+        self.pool.wait()
+
+    def close(self):
+        if self.own_pool:
+            self.pool.close()
+        else:
+            self.pool.wait()
@@ -0,0 +1,313 @@
+import numpy as np
+import os
+
+"""
+Streaming statistics of trip costs. All statistics are updated one batch of
+observations at a time in O(batch) and use memory independent of the number
+of observations:
+
+    - RunningStats: count, mean, variance, minimum and maximum (Welford/Chan)
+    - QuantileSketch: quantile, exact for the first observations, then estimated
+      with the P^2 algorithm of Jain and Chlamtac
+    - TripStatistics: both of them per ant and for the whole colony
+
+Each class keeps the statistics of many entities (e.g. ants) in arrays,
+the first axis of each array being the entity.
+"""
+
+class RunningStats:
+    """
+    Online count, mean, variance, minimum and maximum of the observations of n entities
+
+    Attributes:
+        - count, mean, m2, minimum, maximum: arrays with one entry per entity,
+            m2 being the sum of squared deviations from the mean
+
+    Methods:
+        - update(indices, values): adds observations, indices may repeat
+        - variance() -> sample variance of each entity, nan below two observations
+        - add(n): appends n entities without observations
+        - select(keep): keeps only the entities selected by the boolean array keep
+    """
+    arrays = ('count', 'mean', 'm2', 'minimum', 'maximum')
+
+    def __init__(self, n):
+
+        self.count = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.minimum = np.full(n, np.inf)
+        self.maximum = np.full(n, -np.inf)
+
+    def update(self, indices, values):
+        n = len(self.count)
+        count = np.bincount(indices, minlength=n)
+        mean = np.bincount(indices, weights=values, minlength=n) / np.maximum(count, 1)
+        m2 = np.bincount(indices, weights=(values - mean[indices])**2, minlength=n)
+
+        # merge the statistics of the batch into the running ones
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += np.divide(delta * count, total, out=np.zeros(n), where=total > 0)
+        self.m2 += m2 + np.divide(delta**2 * self.count * count, total, out=np.zeros(n), where=total > 0)
+        self.count = total
+        np.minimum.at(self.minimum, indices, values)
+        np.maximum.at(self.maximum, indices, values)
+
+    def variance(self):
+        return np.divide(self.m2, self.count - 1, out=np.full(len(self.count), np.nan), where=self.count > 1)
+
+    def add(self, n):
+        other = RunningStats(n)
+        for name in self.arrays:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(other, name)]))
+
+    def select(self, keep):
+        for name in self.arrays:
+            setattr(self, name, getattr(self, name)[keep])
+
+
+class QuantileSketch:
+    """
+    Estimate of the q-quantile of the observations of n entities: the first
+    observations of each entity are kept sorted in a buffer and give the exact
+    quantile, once the buffer is full the P^2 algorithm takes over, moving
+    five markers initialised at the quantiles of the buffer, the middle one
+    tracking the quantile, along with every further observation
+
+    Attributes:
+        - q: quantile to estimate, 0.5 for the median
+        - count: number of observations of each entity
+        - buffer: (n x buffer size) first observations of each entity in ascending order
+        - heights: (n x 5) heights of the markers
+        - positions: (n x 5) positions of the markers
+        - desired: (n x 5) desired positions of the markers
+
+    Methods:
+        - update(indices, values): adds one observation to each of the entities indices
+        - extend(index, values): adds many observations to the entity index one after another
+        - quantile(indices) -> estimate of the quantile of the entities indices,
+            of all entities if None, nan without observations
+        - add(n): appends n entities without observations
+        - select(keep): keeps only the entities selected by the boolean array keep
+    """
+    arrays = ('count', 'buffer', 'heights', 'positions', 'desired')
+
+    def __init__(self, n, q=0.5, buffer_size=128):
+
+        self.q = q
+        self.fractions = np.array([0, q/2, q, (1+q)/2, 1])
+        self.count = np.zeros(n, dtype=np.int64)
+        self.buffer = np.full((n, max(buffer_size, 5)), np.inf)
+        self.heights = np.zeros((n, 5))
+        self.positions = np.zeros((n, 5))
+        self.desired = np.zeros((n, 5))
+
+    def update(self, indices, values):
+        """
+        Adds values[i] to the observations of entity indices[i], indices must not repeat
+        """
+        indices, values = np.asarray(indices), np.asarray(values, dtype=np.float64)
+        size = self.buffer.shape[1]
+        count = self.count[indices]
+        self.count[indices] += 1
+
+        # the first observations are kept sorted in the buffer
+        filling = count < size
+        rows = indices[filling]
+        self.buffer[rows, count[filling]] = values[filling]
+        self.buffer[rows] = np.sort(self.buffer[rows], axis=1)
+
+        # with the buffer full, the markers start at its quantiles
+        starting = indices[count == size]
+        ranks = np.round(self.fractions * (size - 1))
+        self.heights[starting] = self.buffer[starting][:, ranks.astype(np.int64)]
+        self.positions[starting] = ranks
+        self.desired[starting] = self.fractions * (size - 1)
+
+        indices, x = indices[~filling], values[~filling]
+        if len(indices) == 0:
+            return
+        h, p, d = self.heights[indices], self.positions[indices], self.desired[indices]
+
+        # find the cell of x, extending the extreme markers if necessary
+        k = (h[:, 1:4] <= x[:, None]).sum(axis=1)
+        h[:, 0] = np.minimum(h[:, 0], x)
+        h[:, 4] = np.maximum(h[:, 4], x)
+        p += np.arange(5) > k[:, None]
+        d += self.fractions
+
+        # move the middle markers towards their desired positions
+        rows = np.arange(len(indices))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i in (1, 2, 3):
+                delta = d[:, i] - p[:, i]
+                move = ((delta >= 1) & (p[:, i+1] - p[:, i] > 1)) | ((delta <= -1) & (p[:, i-1] - p[:, i] < -1))
+                s = np.sign(delta)
+                parabolic = h[:, i] + s / (p[:, i+1] - p[:, i-1]) * (
+                    (p[:, i] - p[:, i-1] + s) * (h[:, i+1] - h[:, i]) / (p[:, i+1] - p[:, i])
+                    + (p[:, i+1] - p[:, i] - s) * (h[:, i] - h[:, i-1]) / (p[:, i] - p[:, i-1]))
+                neighbor = i + s.astype(np.int64)
+                linear = h[:, i] + s * (h[rows, neighbor] - h[:, i]) / (p[rows, neighbor] - p[:, i])
+                height = np.where((h[:, i-1] < parabolic) & (parabolic < h[:, i+1]), parabolic, linear)
+                h[move, i] = height[move]
+                p[move, i] += s[move]
+
+        self.heights[indices], self.positions[indices], self.desired[indices] = h, p, d
+
+    def extend(self, index, values):
+        """
+        Adds values one after another to the observations of entity index, with
+        the same result as one update() per value but without its overhead
+        """
+        values = np.asarray(values, dtype=np.float64)
+        size = self.buffer.shape[1]
+        count = int(self.count[index])
+
+        # the first observations are kept sorted in the buffer
+        take = min(max(size - count, 0), len(values))
+        if take:
+            row = self.buffer[index]
+            row[count:count + take] = values[:take]
+            row.sort()
+            count += take
+        self.count[index] = count + len(values) - take
+        if take == len(values):
+            return
+
+        # the remaining observations move the markers, in plain floats
+        if count == size:
+            ranks = np.round(self.fractions * (size - 1))
+            self.heights[index] = self.buffer[index, ranks.astype(np.int64)]
+            self.positions[index] = ranks
+            self.desired[index] = self.fractions * (size - 1)
+        h, p, d = self.heights[index].tolist(), self.positions[index].tolist(), self.desired[index].tolist()
+        fractions = self.fractions.tolist()
+        for x in values[take:].tolist():
+            k = (h[1] <= x) + (h[2] <= x) + (h[3] <= x)
+            h[0], h[4] = min(h[0], x), max(h[4], x)
+            for i in range(k + 1, 5):
+                p[i] += 1
+            for i in range(5):
+                d[i] += fractions[i]
+            for i in (1, 2, 3):
+                delta = d[i] - p[i]
+                if (delta >= 1 and p[i+1] - p[i] > 1) or (delta <= -1 and p[i-1] - p[i] < -1):
+                    s = 1.0 if delta > 0 else -1.0
+                    parabolic = h[i] + s / (p[i+1] - p[i-1]) * (
+                        (p[i] - p[i-1] + s) * (h[i+1] - h[i]) / (p[i+1] - p[i])
+                        + (p[i+1] - p[i] - s) * (h[i] - h[i-1]) / (p[i] - p[i-1]))
+                    if h[i-1] < parabolic < h[i+1]:
+                        h[i] = parabolic
+                    else:
+                        neighbor = i + int(s)
+                        h[i] = h[i] + s * (h[neighbor] - h[i]) / (p[neighbor] - p[i])
+                    p[i] += s
+        self.heights[index], self.positions[index], self.desired[index] = h, p, d
+
+    def quantile(self, indices=None):
+        indices = np.arange(len(self.count)) if indices is None else np.asarray(indices)
+        counts = self.count[indices]
+        estimates = self.heights[indices, 2]
+
+        # interpolate between the buffered observations while they are complete
+        buffered = (counts > 0) & (counts <= self.buffer.shape[1])
+        rank = (counts[buffered] - 1) * self.q
+        below = np.floor(rank).astype(np.int64)
+        above = np.ceil(rank).astype(np.int64)
+        rows = indices[buffered]
+        lower = self.buffer[rows, below]
+        estimates[buffered] = lower + (rank - below) * (self.buffer[rows, above] - lower)
+        estimates[counts == 0] = np.nan
+        return estimates
+
+    def add(self, n):
+        other = QuantileSketch(n, self.q, self.buffer.shape[1])
+        for name in self.arrays:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(other, name)]))
+
+    def select(self, keep):
+        for name in self.arrays:
+            setattr(self, name, getattr(self, name)[keep])
+
+
+class TripStatistics:
+    """
+    Running statistics and median estimates of the trip costs of each ant
+    and of the whole colony
+
+    Attributes:
+        - ants: RunningStats of the trip costs of each ant
+        - ant_medians: QuantileSketch of the median trip cost of each ant
+        - colony: RunningStats of all trip costs
+        - colony_median: QuantileSketch of the median of all trip costs
+        - medians: current median estimate of each ant, nan before its first trip
+        - median_sum: sum of the median estimates of all ants with trips
+        - with_trips: number of ants with trips
+
+    Methods:
+        - update(indices, costs): records completed trips of the ants indices
+        - solution() -> mean over the ants of their median trip cost, in O(1)
+        - add(n), select(keep): appends or removes ants
+        - save(directory), load(directory) -> TripStatistics:
+            writes and reads all statistics as .npy files
+    """
+    def __init__(self, n):
+
+        self.ants = RunningStats(n)
+        self.ant_medians = QuantileSketch(n)
+        self.colony = RunningStats(1)
+        self.colony_median = QuantileSketch(1)
+        self.medians = np.full(n, np.nan)
+        self.median_sum = 0.0
+        self.with_trips = 0
+
+    def update(self, indices, costs):
+        """
+        Records completed trips, indices must not repeat
+        """
+        self.ants.update(indices, costs)
+        self.ant_medians.update(indices, costs)
+        self.colony.update(np.zeros(len(indices), dtype=np.int64), costs)
+        self.colony_median.extend(0, costs)
+
+        # keep the sum of the medians up to date for solution()
+        medians = self.ant_medians.quantile(indices)
+        first = self.ants.count[indices] == 1
+        self.median_sum += (medians - np.where(first, 0.0, self.medians[indices])).sum()
+        self.with_trips += np.count_nonzero(first)
+        self.medians[indices] = medians
+
+    def solution(self):
+        return self.median_sum / self.with_trips if self.with_trips else np.nan
+
+    def add(self, n):
+        self.ants.add(n)
+        self.ant_medians.add(n)
+        self.medians = np.concatenate([self.medians, np.full(n, np.nan)])
+
+    def select(self, keep):
+        self.ants.select(keep)
+        self.ant_medians.select(keep)
+        self.medians = self.medians[keep]
+        self.median_sum = np.nansum(self.medians)
+        self.with_trips = np.count_nonzero(self.ants.count)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for prefix in ('ants', 'ant_medians', 'colony', 'colony_median'):
+            statistics = getattr(self, prefix)
+            for name in statistics.arrays:
+                np.save(os.path.join(directory, prefix + "_" + name + ".npy"), getattr(statistics, name))
+        np.save(os.path.join(directory, "medians.npy"), self.medians)
+
+    @classmethod
+    def load(cls, directory):
+        statistics = cls(0)
+        for prefix in ('ants', 'ant_medians', 'colony', 'colony_median'):
+            for name in getattr(statistics, prefix).arrays:
+                setattr(getattr(statistics, prefix), name, np.load(os.path.join(directory, prefix + "_" + name + ".npy")))
+        statistics.medians = np.load(os.path.join(directory, "medians.npy"))
+        statistics.median_sum = np.nansum(statistics.medians)
+        statistics.with_trips = np.count_nonzero(statistics.ants.count)
+        return statistics
@@ -0,0 +1,192 @@
+from graph import Graph
+from itertools import product
+from multiprocessing import Pool
+import os
+import shutil
+import tempfile
+import numpy as np
+
+"""
+Parameter sweeps: every cell of a grid of parameter values is simulated
+with its own random stream, spread over a pool of worker processes.
+The base parameters, which carry the network (edges, costs, max_vols),
+are sent to each worker once when it starts, tasks only carry the
+values of the cell and a seed. Each worker builds one Graph and resets
+it for every cell. A network given by network_path is memory-mapped
+by all workers, so they share one copy of it.
+
+performSuccessiveHalving() searches the same kind of grid adaptively,
+continuing only the best candidates with larger numbers of steps.
+"""
+
+# Graph of the worker process, reset for every simulated cell
+_graph = None
+
+def _initWorker(parameters):
+    global _graph
+    _graph = Graph(dict(parameters))
+
+def _runCell(task):
+    index, overrides, seed = task
+    _graph.reset(dict(overrides, seed=seed))
+    _graph.performSimulation()
+    return index, _graph.getSolution()
+
+def performSweep(parameters, grid, replicas=1, processes=None, seed=None):
+    """
+    Simulates every combination of the parameter values given in grid
+
+    Arguments:
+        parameters: base setup variables, shared by all cells
+        grid: dict mapping parameter names to lists of their values,
+            the order of the names gives the order of the result axes
+        replicas: number of independent simulations of each cell
+        processes: number of worker processes, all cores if None,
+            1 runs the sweep in the current process
+        seed: seed from which independent seeds of all simulations are spawned
+
+    Return:
+        solutions: array of getSolution() values of shape
+            (len(values) for values in grid.values()) + (replicas,)
+        best: index into the grid of the cell with the lowest mean solution
+    """
+    names = list(grid)
+    shape = tuple(len(grid[name]) for name in names)
+    cells = list(product(*[range(length) for length in shape]))
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(cells) * replicas)]
+
+    tasks = []
+    for i, cell in enumerate(cells):
+        overrides = {name: grid[name][j] for name, j in zip(names, cell)}
+        for replica in range(replicas):
+            tasks.append((cell + (replica,), overrides, seeds[i * replicas + replica]))
+
+    solutions = np.full(shape + (replicas,), np.nan)
+    if processes == 1:
+        _initWorker(parameters)
+        for task in tasks:
+            index, solution = _runCell(task)
+            solutions[index] = solution
+    else:
+        processes = processes or os.cpu_count()
+        with Pool(processes, initializer=_initWorker, initargs=(parameters,)) as pool:
+            chunksize = max(1, len(tasks) // (4 * processes))
+            for index, solution in pool.imap_unordered(_runCell, tasks, chunksize):
+                solutions[index] = solution
+
+    best = np.unravel_index(np.nanargmin(np.nanmean(solutions, axis=-1)), shape)
+    return solutions, best
+
+def _runCandidate(task):
+    index, overrides, seed, steps, path, keep = task
+    # a candidate of an earlier rung continues from its checkpoint
+    if os.path.isdir(path):
+        graph = Graph.fromCheckpoint(path, mmap_mode=None)
+    else:
+        _graph.reset(dict(overrides, seed=seed))
+        graph = _graph
+    graph.parameters['steps'] = steps
+    graph.performSimulation()
+    if keep:
+        graph.saveCheckpoint(path)
+    return index, graph.getSolution()
+
+def _refineGrid(grid, best, points):
+    """
+    Returns a grid of points values around the best value of each numeric
+    parameter, spanning the spacing of the grid on both sides within its range
+    """
+    refined = {}
+    for name, values in grid.items():
+        numeric = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if len(numeric) < 2 or len(numeric) < len(values):
+            refined[name] = [best[name]]
+            continue
+        spacing = np.diff(np.unique(numeric)).min()
+        lo, hi = max(best[name] - spacing, min(numeric)), min(best[name] + spacing, max(numeric))
+        refined[name] = np.unique(np.linspace(lo, hi, points)).tolist()
+    return refined
+
+def performSuccessiveHalving(parameters, grid, min_steps=10, eta=3, replicas=1, processes=None, seed=None,
+                             refine=0, refine_points=5):
+    """
+    Adaptive search for the best combination of the parameter values given in grid:
+    all candidates are simulated for min_steps steps, the best 1/eta of them by
+    getSolution() continue for eta times as many steps, and so on until the
+    remaining ones reach the steps given in parameters. Continued candidates
+    resume from checkpoints, so no step is simulated twice. Optionally the
+    search is repeated refine times on a finer grid around the best values
+
+    Arguments:
+        parameters: base setup variables, steps being the budget of the best candidates
+        grid: dict mapping parameter names to lists of their values
+        min_steps: steps of all candidates in the first rung
+        eta: factor by which the candidates are reduced and the steps increased per rung
+        replicas: number of independent simulations of each candidate
+        processes: number of worker processes, all cores if None,
+            1 runs the search in the current process
+        seed: seed from which independent seeds of all simulations are spawned
+        refine: number of searches on a refined grid after the first one
+        refine_points: number of values per numeric parameter of a refined grid
+
+    Return:
+        best: dict with the parameter values of the best candidate
+        rungs: list of dicts, one per rung, with its steps, its candidates as
+            dicts of parameter values and their getSolution() values of shape
+            (candidates, replicas)
+    """
+    parameters = dict(parameters)
+    max_steps = parameters['steps']
+
+    # the legacy reset counts in remaining steps, fix its step for continued runs
+    step_to_reset = parameters.get('step_to_reset', -1)
+    if 0 <= max_steps - step_to_reset < max_steps:
+        parameters['events'] = list(parameters.get('events', [])) + [
+            {'step': max_steps - step_to_reset, 'type': 'reset_pheromones', 'edges': parameters['edges_to_reset']}]
+    parameters['step_to_reset'] = -1
+
+    budgets = [max_steps]
+    while budgets[0] // eta >= min_steps:
+        budgets.insert(0, budgets[0] // eta)
+
+    processes = processes or os.cpu_count()
+    pool = Pool(processes, initializer=_initWorker, initargs=(parameters,)) if processes > 1 else None
+    if pool is None:
+        _initWorker(parameters)
+    directory = tempfile.mkdtemp(prefix="halving")
+    rungs, best, best_solution = [], None, np.inf
+    try:
+        for search in range(refine + 1):
+            names = list(grid)
+            candidates = [dict(zip(names, values)) for values in product(*grid.values())]
+            seeds = np.random.SeedSequence(None if seed is None else (seed, search)).spawn(len(candidates) * replicas)
+            seeds = np.array([int(child.generate_state(1)[0]) for child in seeds]).reshape(len(candidates), replicas)
+            alive = np.arange(len(candidates))
+            done = 0
+            for budget in budgets:
+                tasks = [((i, replica), candidates[c], int(seeds[c, replica]), budget - done,
+                          os.path.join(directory, "%d_%d_%d" % (search, c, replica)), budget < max_steps)
+                         for i, c in enumerate(alive) for replica in range(replicas)]
+                solutions = np.full((len(alive), replicas), np.nan)
+                results = map(_runCandidate, tasks) if pool is None else \
+                    pool.imap_unordered(_runCandidate, tasks, max(1, len(tasks) // (4 * processes)))
+                for index, solution in results:
+                    solutions[index] = solution
+                rungs.append({'steps': budget, 'candidates': [candidates[c] for c in alive], 'solutions': solutions})
+
+                # candidates without any completed trip are the worst
+                means = np.where(np.isnan(solutions), np.inf, solutions).mean(axis=1)
+                order = np.argsort(means, kind='stable')
+                done = budget
+                if budget == max_steps:
+                    if best is None or means[order[0]] < best_solution:
+                        best, best_solution = candidates[alive[order[0]]], means[order[0]]
+                    break
+                alive = alive[order[:max(1, int(np.ceil(len(alive) / eta)))]]
+            grid = _refineGrid(grid, best, refine_points)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        shutil.rmtree(directory, ignore_errors=True)
+    return best, rungs
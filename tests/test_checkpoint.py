@@ -0,0 +1,59 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edgestore import EdgeStore
+from graph import Graph
+from loaders import fromTuples
+
+EDGES = [(0, 1, 2, 2), (0, 2, 10, 10), (1, 3, 1, 1), (1, 4, 2, 2), (2, 4, 10, 10), (2, 5, 10, 10),
+         (3, 6, 1, 1), (4, 6, 10, 10), (4, 7, 2, 2), (6, 8, 10, 10), (7, 8, 2, 2)]
+
+# the cost event comes after the checkpoint, reset() has to undo it
+EVENTS = [{'step': 15, 'type': 'cost', 'edges': [(3, 6)], 'value': 20}]
+
+def replicaParameters(network_path):
+    return {'verbose': False, 'network_path': network_path, 'node_number': 9, 'ant_number': 20,
+            'steps': 30, 'src_nodes': [0], 'dst_nodes': [8], 'init_pheromon': 1, 'alpha': 1, 'beta': 1,
+            'gamma': 1, 'enhancement_rate': 0.2, 'evaporation_rate': 0.01, 'seed': 1, 'replicas': 2,
+            'events': EVENTS}
+
+@pytest.mark.parametrize('aggregate', [False, True])
+def test_replica_checkpoint_round_trip(tmp_path, aggregate):
+    network_path = str(tmp_path / "network")
+    EdgeStore.fromEdgeList(**fromTuples(EDGES)).saveNetwork(network_path)
+    parameters = dict(replicaParameters(network_path), aggregate=aggregate)
+
+    uninterrupted = Graph(dict(parameters))
+    uninterrupted.performSimulation()
+
+    graph = Graph(dict(parameters))
+    for _ in range(10):
+        graph.performStep()
+    graph.saveCheckpoint(str(tmp_path / "checkpoint"))
+    restored = Graph.fromCheckpoint(str(tmp_path / "checkpoint"))
+    restored.performSimulation()
+    assert np.array_equal(restored.edges.pheromones, uninterrupted.edges.pheromones)
+    assert np.array_equal(restored.edges.costs, uninterrupted.edges.costs)
+
+    # both start over on the unchanged network of all replicas
+    uninterrupted.reset()
+    restored.reset()
+    assert restored.edges.costs.tolist() == np.tile(EdgeStore.loadNetwork(network_path, 1).costs, 2).tolist()
+    uninterrupted.performSimulation()
+    restored.performSimulation()
+    assert np.array_equal(restored.edges.pheromones, uninterrupted.edges.pheromones)
+    assert restored.getSolution() == uninterrupted.getSolution()
+
+def test_checkpoint_interval_needs_path(tmp_path):
+    network_path = str(tmp_path / "network")
+    EdgeStore.fromEdgeList(**fromTuples(EDGES)).saveNetwork(network_path)
+    with pytest.raises(ValueError, match="checkpoint_path"):
+        Graph(dict(replicaParameters(network_path), checkpoint_interval=5))
+
+    graph = Graph(replicaParameters(network_path))
+    with pytest.raises(ValueError, match="checkpoint_path"):
+        graph.reset({'checkpoint_interval': 5})
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cli import main
+
+CONFIG = os.path.join(ROOT, "configs", "experimentc.toml")
+
+def test_run_without_trips_writes_null(tmp_path):
+    # one step is too short for any trip, the solutions are nan
+    path = tmp_path / "result.json"
+    main(['run', CONFIG, '--set', 'steps=1', '--set', 'verbose=false', '--set', 'replicas=3',
+          '--output', str(path)])
+
+    result = json.loads(path.read_text(), parse_constant=lambda constant: constant)
+    assert result['solution'] is None
+    assert result['replicas']['replicas'] == 0
+    assert result['replicas']['mean'] is None
+    assert result['replicas']['quantiles'] == {'0.05': None, '0.25': None, '0.5': None, '0.75': None, '0.95': None}
+
+def test_run_into_closed_pipe():
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "cli.py"), 'run', CONFIG, '--set', 'steps=1',
+                                '--set', 'verbose=false', '--top', '100000'],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=ROOT)
+    # the reader stops before the result is written, as head does
+    process.stdout.close()
+    stderr = process.stderr.read().decode()
+    process.wait()
+    assert 'Traceback' not in stderr
@@ -0,0 +1,62 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph import Graph
+from recorder import Recorder
+
+EDGES = [(0, 1, 2, 2), (0, 2, 10, 10), (1, 3, 1, 1), (1, 4, 2, 2), (2, 4, 10, 10), (2, 5, 10, 10),
+         (3, 6, 1, 1), (4, 6, 10, 10), (4, 7, 2, 2), (6, 8, 10, 10), (7, 8, 2, 2)]
+
+# the cheapest way 0-1-3-6-8 is cut after step 5, node 3 becomes a dead end
+CLOSE_STEP = 5
+EVENTS = [{'step': CLOSE_STEP, 'type': 'close', 'edges': [(3, 6)]}]
+
+class ClosedEdgeRecorder(Recorder):
+    """
+    Keeps the number of vehicles on every half-edge after every step
+    """
+    def __init__(self):
+        super().__init__()
+        self.on_edge = []
+
+    def record(self, graph):
+        edges = graph.edges
+        if graph.parameters.get('aggregate', False):
+            on_edge = graph.colony.onEdges(len(edges.neighbors))
+        else:
+            on_edge = np.bincount(graph.colony.edge[graph.colony.edge >= 0], minlength=len(edges.neighbors))
+        self.on_edge.append(on_edge)
+
+def closedGraph(**parameters):
+    return Graph(dict({'verbose': False, 'custom_graph': True, 'custom_weights': True, 'edges': EDGES,
+                       'node_number': 9, 'ant_number': 50, 'steps': 30, 'src_nodes': [0], 'dst_nodes': [8],
+                       'init_pheromon': 1, 'alpha': 1, 'beta': 1, 'gamma': 1, 'enhancement_rate': 0.2,
+                       'evaporation_rate': 0.01, 'seed': 1, 'events': EVENTS}, **parameters))
+
+@pytest.mark.parametrize('parameters', [{}, {'batched': True}, {'aggregate': True},
+                                        {'alpha': 0}, {'alpha': 0, 'batched': True}, {'alpha': 0, 'aggregate': True},
+                                        {'heuristic': True}, {'replicas': 2, 'batched': True}])
+def test_no_vehicle_on_closed_edge(parameters):
+    graph = closedGraph(**parameters)
+    recorder = ClosedEdgeRecorder()
+    graph.addRecorder(recorder)
+    graph.performSimulation()
+
+    closed = graph.edges.closed
+    assert closed.sum() == 2 * graph.edges.replicas
+    on_closed = np.array(recorder.on_edge)[:, closed].sum(axis=1)
+    # the edge was taken before the closure, never after it
+    assert on_closed[:CLOSE_STEP].sum() > 0
+    assert on_closed[CLOSE_STEP:].tolist() == [0] * (30 - CLOSE_STEP)
+
+def test_reopen_after_close():
+    graph = closedGraph(events=EVENTS + [{'step': 10, 'type': 'reopen', 'edges': [(6, 3)]}])
+    graph.performSimulation()
+
+    assert not graph.edges.closed.any()
+    graph.reset()
+    assert not graph.edges.closed.any()
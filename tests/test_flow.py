@@ -0,0 +1,45 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph import Graph
+
+# two separate roads, every trip takes the only way there and back
+ROADS = [(0, 1, 1, 100), (2, 3, 7, 100)]
+
+def roadsGraph(**parameters):
+    # 3 of 4 vehicles travel between 0 and 1, the others between 2 and 3
+    return Graph(dict({'verbose': False, 'custom_graph': True, 'custom_weights': True, 'edges': ROADS,
+                       'node_number': 4, 'ant_number': 40, 'steps': 30, 'src_nodes': [0, 0, 0, 2],
+                       'dst_nodes': [1, 1, 1, 3], 'init_pheromon': 1, 'alpha': 1, 'beta': 1, 'gamma': 1,
+                       'enhancement_rate': 0.2, 'evaporation_rate': 0.01, 'seed': 1}, **parameters))
+
+@pytest.mark.parametrize('parameters', [{}, {'aggregate': True}, {'aggregate': True, 'replicas': 3}])
+def test_solution_weights_pairs_by_vehicles(parameters):
+    graph = roadsGraph(**parameters)
+    graph.performSimulation()
+
+    assert graph.getSolution() == pytest.approx((30 * 1 + 10 * 7) / 40)
+    assert graph.getSolutions() == pytest.approx([(30 * 1 + 10 * 7) / 40] * parameters.get('replicas', 1))
+
+def test_flow_keeps_only_occupied_entries():
+    graph = roadsGraph(aggregate=True, replicas=50, steps=5)
+    graph.performSimulation()
+
+    colony = graph.colony
+    # two groups per pair and replica, each on at most one half-edge of its road
+    assert len(colony.src_node) == 4 * 50
+    assert len(colony.entry_count) <= 4 * 50
+    assert len(colony) == 40 * 50
+    assert np.array_equal(colony.onEdges(len(graph.edges.neighbors)).reshape(50, -1).sum(axis=1), [40] * 50)
+
+def test_flow_state_grows_linearly_with_replicas():
+    def stateSize(replicas):
+        graph = roadsGraph(aggregate=True, replicas=replicas, steps=5)
+        graph.performSimulation()
+        return sum(getattr(graph.colony, name).nbytes for name in graph.colony.arrays)
+
+    assert stateSize(200) == 10 * stateSize(20)
@@ -0,0 +1,64 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph import Graph
+from loaders import readCsv, readGraphml
+
+GRAPHML = """<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="d0" for="edge" attr.name="max_vol" attr.type="double"/>
+  <key id="d1" for="edge" attr.name="cost_back" attr.type="double"/>
+  <graph edgedefault="undirected">
+    <node id="0"/><node id="1"/><node id="2"/>
+    <edge source="0" target="1"><data key="d0">5</data></edge>
+    <edge source="1" target="2"><data key="d1">3</data><data key="d0">7</data></edge>
+    <edge source="0" target="2"/>
+  </graph>
+</graphml>
+"""
+
+def test_csv_takes_columns_by_name(tmp_path):
+    path = tmp_path / "network.csv"
+    path.write_text("target,max_vol,source\n1,5,0\n2,7,1\n")
+    network = readCsv(str(path))
+
+    assert network['sources'].tolist() == [0, 1]
+    assert network['targets'].tolist() == [1, 2]
+    assert network['costs'].tolist() == [1, 1]
+    assert network['max_vols'].tolist() == [5, 7]
+    assert network['costs_back'] is None and network['max_vols_back'] is None
+
+def test_csv_backward_columns_default_to_forward_ones(tmp_path):
+    path = tmp_path / "network.csv"
+    path.write_text("source,target,cost,cost_back\n0,1,2,4\n1,2,3,\n")
+    network = readCsv(str(path))
+
+    assert network['costs'].tolist() == [2, 3]
+    assert network['max_vols'].tolist() == [1, 1]
+    assert network['costs_back'].tolist() == [4, 3]
+    assert network['max_vols_back'] is None
+
+def test_graphml_takes_data_by_name(tmp_path):
+    path = tmp_path / "network.graphml"
+    path.write_text(GRAPHML)
+    network = readGraphml(str(path))
+
+    assert network['node_number'] == 3
+    assert network['costs'].tolist() == [1, 1, 1]
+    assert network['max_vols'].tolist() == [5, 7, 1]
+    assert network['costs_back'].tolist() == [1, 3, 1]
+    assert np.array_equal(network['sources'], [0, 1, 0])
+
+def test_graph_with_attributes_after_plain_edges():
+    # the first edge has no attributes, the others still have to be loaded
+    graph = Graph({'verbose': False, 'custom_graph': True, 'custom_weights': True,
+                   'edges': [(0, 1), (1, 2, 3, 4), (0, 2, 5, 6, 7, 8)], 'node_number': 3,
+                   'ant_number': 2, 'steps': 1, 'src_nodes': [0], 'dst_nodes': [2], 'init_pheromon': 1,
+                   'alpha': 1, 'beta': 1, 'gamma': 1, 'enhancement_rate': 0.2, 'evaporation_rate': 0.01, 'seed': 1})
+    edges = graph.edges
+    costs = {(node, int(edges.neighbors[i])): edges.costs[i]
+             for node in range(3) for i in range(edges.offsets[node], edges.offsets[node + 1])}
+    assert costs == {(0, 1): 1, (1, 0): 1, (1, 2): 3, (2, 1): 3, (0, 2): 5, (2, 0): 7}
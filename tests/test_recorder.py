@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph import Graph
+from recorder import RingBufferRecorder, NpyRecorder, NdjsonRecorder
+
+EDGES = [(0, 1, 2, 2), (0, 2, 10, 10), (1, 3, 1, 1), (1, 4, 2, 2), (2, 4, 10, 10), (2, 5, 10, 10),
+         (3, 6, 1, 1), (4, 6, 10, 10), (4, 7, 2, 2), (6, 8, 10, 10), (7, 8, 2, 2)]
+
+# 20 ants, 5 more from step 5 on, all of them removed at step 10
+EVENTS = [{'step': 5, 'type': 'add_demand', 'src': 0, 'dst': 8, 'ants': 5},
+          {'step': 10, 'type': 'remove_demand', 'src': 0, 'dst': 8, 'ants': 25}]
+
+def demandGraph(batched):
+    return Graph({'verbose': False, 'custom_graph': True, 'custom_weights': True, 'edges': EDGES,
+                  'node_number': 9, 'ant_number': 20, 'steps': 15, 'src_nodes': [0], 'dst_nodes': [8],
+                  'init_pheromon': 1, 'alpha': 1, 'beta': 1, 'gamma': 1, 'enhancement_rate': 0.2,
+                  'evaporation_rate': 0.01, 'seed': 1, 'batched': batched, 'events': EVENTS})
+
+def ants(snapshots):
+    # cost_sum is never nan for an existing ant
+    return (~np.isnan(snapshots['cost_sum'])).sum(axis=1).tolist()
+
+ANTS = [20] * 5 + [25] * 5 + [0] * 5
+
+@pytest.mark.parametrize('batched', [False, True])
+def test_ring_buffer_with_demand_events(batched):
+    graph = demandGraph(batched)
+    recorder = RingBufferRecorder(capacity=20)
+    graph.addRecorder(recorder)
+    graph.performSimulation()
+
+    snapshots = recorder.snapshots()
+    assert snapshots['step'].tolist() == list(range(1, 16))
+    assert snapshots['cost_sum'].shape == (15, 25)
+    assert ants(snapshots) == ANTS
+    assert snapshots['pheromones'].shape == (15, len(EDGES))
+
+def test_ring_buffer_wraps_with_demand_events():
+    graph = demandGraph(True)
+    recorder = RingBufferRecorder(capacity=4)
+    graph.addRecorder(recorder)
+    graph.performSimulation()
+
+    snapshots = recorder.snapshots()
+    assert snapshots['step'].tolist() == [12, 13, 14, 15]
+    assert ants(snapshots) == [0] * 4
+
+@pytest.mark.parametrize('batched', [False, True])
+def test_npy_with_demand_events(tmp_path, batched):
+    graph = demandGraph(batched)
+    recorder = NpyRecorder(str(tmp_path), chunk_size=3)
+    graph.addRecorder(recorder)
+    graph.performSimulation()
+
+    snapshots = NpyRecorder.load(str(tmp_path))
+    assert snapshots['step'].tolist() == list(range(1, 16))
+    assert snapshots['cost_sum'].shape == (15, 25)
+    assert ants(snapshots) == ANTS
+
+@pytest.mark.parametrize('batched', [False, True])
+def test_ndjson_with_demand_events(tmp_path, batched):
+    graph = demandGraph(batched)
+    recorder = NdjsonRecorder(str(tmp_path / "run.ndjson"))
+    graph.addRecorder(recorder)
+    graph.performSimulation()
+    recorder.close()
+
+    with open(tmp_path / "run.ndjson") as f:
+        lines = [json.loads(line) for line in f]
+    assert [line['step'] for line in lines] == list(range(1, 16))
+    assert [len(line['cost_sum']) for line in lines] == ANTS
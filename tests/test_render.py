@@ -0,0 +1,25 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph import Graph
+from render import graphFrame
+
+EDGES = [(0, 1, 2, 2), (0, 2, 10, 10), (1, 3, 1, 1), (1, 4, 2, 2), (2, 4, 10, 10), (2, 5, 10, 10),
+         (3, 6, 1, 1), (4, 6, 10, 10), (4, 7, 2, 2), (6, 8, 10, 10), (7, 8, 2, 2)]
+
+def test_layout_computed_once_per_store():
+    graph = Graph({'verbose': False, 'custom_graph': True, 'custom_weights': True, 'edges': EDGES,
+                   'node_number': 9, 'ant_number': 20, 'steps': 3, 'src_nodes': [0], 'dst_nodes': [8],
+                   'init_pheromon': 1, 'alpha': 1, 'beta': 1, 'gamma': 1, 'enhancement_rate': 0.2,
+                   'evaporation_rate': 0.01, 'seed': 1, 'replicas': 3})
+    first = graphFrame(graph)
+    graph.performSimulation()
+    second = graphFrame(graph)
+
+    # the positions of the original network are reused for every frame
+    assert second['positions'] is first['positions']
+    assert first['positions'].shape == (9, 2)
+    assert not np.array_equal(first['pheromones'], second['pheromones'])